@@ -6,6 +6,7 @@ from starlette.requests import Request
 from starlette.responses import RedirectResponse
 
 from app.config import settings
+from app.exception.user_exceptions import PasswordServiceBusy
 from app.user.auth import create_access_token
 from app.user.dependencies import authenticate_user, get_current_user
 
@@ -17,7 +18,11 @@ class AdminAuth(AuthenticationBackend):
         email, password = form.get("username"), form.get("password")
 
         # Пытаемся аутентифицировать пользователя с помощью функции authenticate_user
-        user = await authenticate_user(email, password)
+        try:
+            user = await authenticate_user(email, password)
+        except PasswordServiceBusy:
+            # Очередь хеширования паролей переполнена, вход отклоняем
+            return False
 
         if user:
             # Если пользователь найден, создаем JWT-токен с ID и email пользователя
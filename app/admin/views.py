@@ -1,10 +1,84 @@
+from typing import Optional
+
 from sqladmin import ModelView
+from sqladmin.pagination import Pagination
+from sqlalchemy import BigInteger, Select, func, select, text
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from starlette.requests import Request
 
+from app.cache.invalidation import invalidate_product_lists, invalidate_products
+from app.config import settings
 from app.database.models import User, Product, Category, Order, OrderItem
 from app.database.models import BasketItem, Basket
+from app.user.dependencies import invalidate_principal
+
+# Колонки, которые нужны __str__ связанной модели в списке
+STR_COLUMNS = {
+    User: [User.email],
+    Basket: [Basket.id],
+    Category: [Category.name],
+    Product: [Product.name],
+    Order: [Order.id],
+}
+
+
+class BaseAdmin(ModelView):
+    """
+    Список выбирает только показанные колонки, связи «многие к одному»
+    подгружает в том же запросе (JOIN), а для больших таблиц вместо точного
+    COUNT(*) берет оценку числа строк из статистики планировщика.
+    Выгрузка (get_model_objects) и остальные страницы работают как в sqladmin.
+    """
+
+    def list_options(self) -> list:
+        columns = [
+            getattr(self.model, name)
+            for name in self._list_prop_names
+            if name not in self._relation_names
+        ]
+        options = [load_only(*columns)]
+        for relation in self._list_relations:
+            loader = selectinload if relation.property.uselist else joinedload
+            target = relation.property.mapper.class_
+            options.append(loader(relation).load_only(*STR_COLUMNS[target]))
+        return options
+
+    async def list(self, request: Request) -> Pagination:
+        # ModelView.list, в котором вместо selectinload каждой связи
+        # используются параметры загрузки из list_options
+        page = self.validate_page_number(request.query_params.get("page"), 1)
+        page_size = self.validate_page_number(request.query_params.get("pageSize"), 0)
+        page_size = min(page_size or self.page_size, max(self.page_size_options))
+        search = request.query_params.get("search", None)
+
+        stmt = self.list_query(request).options(*self.list_options())
+        stmt = self.sort_query(stmt, request)
 
+        if search:
+            stmt = self.search_query(stmt=stmt, term=search)
+            count = await self.count(request, select(func.count()).select_from(stmt))
+        else:
+            count = await self.count(request)
 
-class UserAdmin(ModelView, model=User):
+        stmt = stmt.limit(page_size).offset((page - 1) * page_size)
+        rows = await self._run_query(stmt)
+        return Pagination(rows=rows, page=page, page_size=page_size, count=count)
+
+    async def count(self, request: Request, stmt: Optional[Select] = None) -> int:
+        # Поиск фильтрует строки, поэтому такой список считается точно
+        if stmt is None:
+            estimate = await self._run_query(
+                select(func.greatest(text("reltuples"), 0).cast(BigInteger))
+                .select_from(text("pg_class"))
+                .where(text("oid = CAST(:table AS regclass)"))
+                .params(table=self.model.__tablename__)
+            )
+            if estimate and estimate[0] >= settings.ADMIN_COUNT_ESTIMATE_THRESHOLD:
+                return estimate[0]
+        return await super().count(request, stmt)
+
+
+class UserAdmin(BaseAdmin, model=User):
     column_list = [User.email, User.id] + [User.basket]
     column_details_exclude_list = [User.hash_password]
     can_delete = False
@@ -12,8 +86,17 @@ class UserAdmin(ModelView, model=User):
     name_plural = "Пользователи"
     icon = "fa-solid fa-user"
 
+    async def after_model_change(
+        self, data: dict, model: User, is_created: bool, request: Request
+    ) -> None:
+        # Email мог измениться: токены со старым email должны перестать работать
+        await invalidate_principal(model.id)
+
+    async def after_model_delete(self, model: User, request: Request) -> None:
+        await invalidate_principal(model.id)
 
-class BasketAdmin(ModelView, model=Basket):
+
+class BasketAdmin(BaseAdmin, model=Basket):
     column_list = [Basket.id, Basket.user_id] + [Basket.user]
     column_details_exclude_list = [Basket.order_items]
     can_delete = False
@@ -22,7 +105,7 @@ class BasketAdmin(ModelView, model=Basket):
     icon = "fa-solid fa-basket"
 
 
-class BasketItemAdmin(ModelView, model=BasketItem):
+class BasketItemAdmin(BaseAdmin, model=BasketItem):
     column_list = [c.name for c in BasketItem.__table__.c] + [BasketItem.basket]
     column_details_exclude_list = [BasketItem.basket_id, Basket.order_items]
     can_delete = False
@@ -31,15 +114,25 @@ class BasketItemAdmin(ModelView, model=BasketItem):
     icon = "fa-solid fa-basket_item"
 
 
-class ProductAdmin(ModelView, model=Product):
-    column_list = [c.name for c in Product.__table__.c] + [Category.name]
+class ProductAdmin(BaseAdmin, model=Product):
+    column_list = [c.name for c in Product.__table__.c] + [Product.category]
     column_details_exclude_list = [Product.items, Product.category_id]
     name = "Продукт"
     name_plural = "Продукты"
     icon = "fa-solid fa-product"
 
+    async def after_model_change(
+        self, data: dict, model: Product, is_created: bool, request: Request
+    ) -> None:
+        # Категория товара могла измениться, поэтому очищаем все списки
+        await invalidate_products([{"id": model.id, "category_id": model.category_id}])
+        await invalidate_product_lists()
+
+    async def after_model_delete(self, model: Product, request: Request) -> None:
+        await invalidate_products([{"id": model.id, "category_id": model.category_id}])
+
 
-class OrderAdmin(ModelView, model=Order):
+class OrderAdmin(BaseAdmin, model=Order):
     column_list = [c.name for c in Order.__table__.c] + [Order.user]
     can_delete = False
     can_edit = False
@@ -48,7 +141,7 @@ class OrderAdmin(ModelView, model=Order):
     icon = "fa-solid fa-order"
 
 
-class OrderItemsAdmin(ModelView, model=OrderItem):
+class OrderItemsAdmin(BaseAdmin, model=OrderItem):
     column_list = [c.name for c in OrderItem.__table__.c] + [
         OrderItem.basket,
         OrderItem.product,
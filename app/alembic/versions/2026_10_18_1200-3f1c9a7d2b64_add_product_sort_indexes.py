@@ -0,0 +1,29 @@
+"""Add product sort indexes for keyset pagination
+
+Revision ID: 3f1c9a7d2b64
+Revises: db099cd302f8
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f1c9a7d2b64"
+down_revision: Union[str, None] = "db099cd302f8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_products_price_id", "products", ["price", "id"])
+    op.create_index("ix_products_name_id", "products", ["name", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_name_id", table_name="products")
+    op.drop_index("ix_products_price_id", table_name="products")
@@ -0,0 +1,52 @@
+"""Add lookup indexes for DAO access paths
+
+Revision ID: 9c4e2b7a1f05
+Revises: 3f1c9a7d2b64
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9c4e2b7a1f05"
+down_revision: Union[str, None] = "3f1c9a7d2b64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# basketitems.basket_id уже покрыт уникальным индексом (basket_id, product_id)
+INDEXES = [
+    ("ix_users_email", "users", ["email"], True),
+    ("ix_baskets_user_id", "baskets", ["user_id"], True),
+    ("ix_products_category_id", "products", ["category_id"], False),
+    ("ix_orderitems_order_id", "orderitems", ["order_id"], False),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в таблицы, но не работает в транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=unique,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
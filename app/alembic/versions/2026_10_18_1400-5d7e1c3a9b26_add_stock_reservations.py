@@ -0,0 +1,57 @@
+"""Add stock reservations
+
+Revision ID: 5d7e1c3a9b26
+Revises: 9c4e2b7a1f05
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5d7e1c3a9b26"
+down_revision: Union[str, None] = "9c4e2b7a1f05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Уже лежащие в корзинах товары не резервируются: их наличие
+    # проверяется при оформлении заказа
+    op.add_column(
+        "products",
+        sa.Column("reserved", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.create_table(
+        "reservations",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("basket_id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["basket_id"],
+            ["baskets.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["product_id"],
+            ["products.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "basket_id", "product_id", name="uq_reservations_basket_product"
+        ),
+    )
+    op.create_index(
+        "ix_reservations_expires_at", "reservations", ["expires_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reservations_expires_at", table_name="reservations")
+    op.drop_table("reservations")
+    op.drop_column("products", "reserved")
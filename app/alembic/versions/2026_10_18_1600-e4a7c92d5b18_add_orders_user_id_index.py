@@ -0,0 +1,41 @@
+"""Add orders (user_id, id DESC) index for order history
+
+Revision ID: e4a7c92d5b18
+Revises: b81f4e6c2d93
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4a7c92d5b18"
+down_revision: Union[str, None] = "b81f4e6c2d93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует оформление заказов, но не работает в транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_orders_user_id_id",
+            "orders",
+            ["user_id", sa.text("id DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_orders_user_id_id",
+            table_name="orders",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
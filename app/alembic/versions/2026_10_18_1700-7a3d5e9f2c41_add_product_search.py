@@ -0,0 +1,64 @@
+"""Add product full-text search vector and trigram index
+
+Revision ID: 7a3d5e9f2c41
+Revises: e4a7c92d5b18
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7a3d5e9f2c41"
+down_revision: Union[str, None] = "e4a7c92d5b18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Колонка вычисляется самим PostgreSQL при каждой вставке и изменении;
+    # в модель Product она не входит, чтобы не попадать в обычные выборки
+    op.execute(
+        """
+        ALTER TABLE products ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+        ) STORED
+        """
+    )
+    op.create_index(
+        "ix_products_search_vector",
+        "products",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+
+    # pg_trgm входит в contrib и может быть не установлен на сервере;
+    # без него поиск обходится префиксным полнотекстовым совпадением
+    available = (
+        op.get_bind()
+        .execute(
+            sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        )
+        .scalar()
+    )
+    if available:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            "ix_products_name_trgm",
+            "products",
+            ["name"],
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_name_trgm", table_name="products", if_exists=True)
+    op.drop_index("ix_products_search_vector", table_name="products")
+    op.drop_column("products", "search_vector")
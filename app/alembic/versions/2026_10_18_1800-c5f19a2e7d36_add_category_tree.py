@@ -0,0 +1,222 @@
+"""Add category tree, closure table and product counters
+
+Revision ID: c5f19a2e7d36
+Revises: 7a3d5e9f2c41
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5f19a2e7d36"
+down_revision: Union[str, None] = "7a3d5e9f2c41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+IN_STOCK = "(quantity - reserved > 0)::int"
+
+# Изменения счетчиков по строкам, которые затронул оператор над products
+COUNTER_CHANGES = {
+    "INSERT": f"SELECT category_id, 1, {IN_STOCK} FROM new_rows",
+    "DELETE": f"SELECT category_id, -1, -{IN_STOCK} FROM old_rows",
+    "UPDATE": (
+        f"SELECT category_id, 1, {IN_STOCK} FROM new_rows "
+        f"UNION ALL SELECT category_id, -1, -{IN_STOCK} FROM old_rows"
+    ),
+}
+
+# Счетчики меняются одним UPDATE на оператор (а не на строку), поэтому
+# пакетный импорт и оформление заказа трогают каждую категорию один раз.
+# Строки категорий блокируются по порядку id, чтобы параллельные
+# транзакции не взаимоблокировались.
+COUNTER_FUNCTION = """
+CREATE FUNCTION categorys_count_products_{op}() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    WITH delta AS (
+        SELECT category_id, sum(products) AS products, sum(in_stock) AS in_stock
+        FROM ({changes}) AS changes (category_id, products, in_stock)
+        GROUP BY category_id
+        HAVING sum(products) <> 0 OR sum(in_stock) <> 0
+    ), locked AS MATERIALIZED (
+        SELECT categorys.id FROM categorys
+        JOIN delta ON delta.category_id = categorys.id
+        ORDER BY categorys.id
+        FOR UPDATE OF categorys
+    )
+    UPDATE categorys
+    SET product_count = product_count + delta.products,
+        in_stock_count = in_stock_count + delta.in_stock
+    FROM delta
+    WHERE categorys.id = delta.category_id
+      AND categorys.id IN (SELECT id FROM locked);
+    RETURN NULL;
+END
+$$
+"""
+
+COUNTER_TRIGGER = """
+CREATE TRIGGER products_count_{op} AFTER {event} ON products
+REFERENCING {tables}
+FOR EACH STATEMENT EXECUTE FUNCTION categorys_count_products_{op}()
+"""
+
+TRANSITION_TABLES = {
+    "INSERT": "NEW TABLE AS new_rows",
+    "DELETE": "OLD TABLE AS old_rows",
+    "UPDATE": "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+}
+
+PATH_FUNCTIONS = [
+    """
+    CREATE FUNCTION categorypaths_insert() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO categorypaths (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, NEW.id, depth + 1
+        FROM categorypaths WHERE descendant_id = NEW.parent_id
+        UNION ALL
+        SELECT NEW.id, NEW.id, 0;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE FUNCTION categorypaths_move() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM categorypaths
+            WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id
+        ) THEN
+            RAISE EXCEPTION 'category % cannot be moved into its own subtree', NEW.id
+                USING ERRCODE = 'check_violation';
+        END IF;
+
+        -- Отрываем поддерево от прежних предков
+        DELETE FROM categorypaths path
+        USING categorypaths subtree
+        WHERE subtree.ancestor_id = NEW.id
+          AND path.descendant_id = subtree.descendant_id
+          AND path.ancestor_id IN (
+              SELECT ancestor_id FROM categorypaths
+              WHERE descendant_id = NEW.id AND ancestor_id <> NEW.id
+          );
+
+        -- И подвешиваем его к предкам нового родителя
+        INSERT INTO categorypaths (ancestor_id, descendant_id, depth)
+        SELECT above.ancestor_id, subtree.descendant_id, above.depth + subtree.depth + 1
+        FROM categorypaths above
+        CROSS JOIN categorypaths subtree
+        WHERE above.descendant_id = NEW.parent_id AND subtree.ancestor_id = NEW.id;
+        RETURN NULL;
+    END
+    $$
+    """,
+]
+
+PATH_TRIGGERS = [
+    """
+    CREATE TRIGGER categorys_paths_insert AFTER INSERT ON categorys
+    FOR EACH ROW EXECUTE FUNCTION categorypaths_insert()
+    """,
+    """
+    CREATE TRIGGER categorys_paths_move AFTER UPDATE OF parent_id ON categorys
+    FOR EACH ROW WHEN (OLD.parent_id IS DISTINCT FROM NEW.parent_id)
+    EXECUTE FUNCTION categorypaths_move()
+    """,
+]
+
+
+def upgrade() -> None:
+    op.add_column("categorys", sa.Column("parent_id", sa.Integer(), nullable=True))
+    op.add_column(
+        "categorys",
+        sa.Column("product_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "categorys",
+        sa.Column("in_stock_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.create_foreign_key(
+        "categorys_parent_id_fkey",
+        "categorys",
+        "categorys",
+        ["parent_id"],
+        ["id"],
+        ondelete="SET NULL",
+    )
+    op.create_index("ix_categorys_parent_id", "categorys", ["parent_id"])
+
+    op.create_table(
+        "categorypaths",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("ancestor_id", sa.Integer(), nullable=False),
+        sa.Column("descendant_id", sa.Integer(), nullable=False),
+        sa.Column("depth", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["ancestor_id"], ["categorys.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(
+            ["descendant_id"], ["categorys.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "ancestor_id", "descendant_id", name="uq_categorypaths_ancestor_descendant"
+        ),
+    )
+    op.create_index(
+        "ix_categorypaths_descendant_id", "categorypaths", ["descendant_id"]
+    )
+
+    for statement in PATH_FUNCTIONS + PATH_TRIGGERS:
+        op.execute(statement)
+    # Триггеры создаются до пересчета: CREATE TRIGGER блокирует запись
+    # в products до конца миграции, и пересчет не пропустит изменений
+    for name, changes in COUNTER_CHANGES.items():
+        op.execute(COUNTER_FUNCTION.format(op=name.lower(), changes=changes))
+        op.execute(
+            COUNTER_TRIGGER.format(
+                op=name.lower(), event=name, tables=TRANSITION_TABLES[name]
+            )
+        )
+
+    # Существующие категории становятся корнями дерева
+    op.execute(
+        """
+        INSERT INTO categorypaths (ancestor_id, descendant_id, depth)
+        SELECT id, id, 0 FROM categorys
+        """
+    )
+    op.execute(
+        f"""
+        UPDATE categorys
+        SET product_count = counts.products, in_stock_count = counts.in_stock
+        FROM (
+            SELECT category_id, count(*) AS products, sum({IN_STOCK}) AS in_stock
+            FROM products GROUP BY category_id
+        ) AS counts
+        WHERE counts.category_id = categorys.id
+        """
+    )
+
+
+def downgrade() -> None:
+    for name in reversed(COUNTER_CHANGES):
+        op.execute(f"DROP TRIGGER products_count_{name.lower()} ON products")
+        op.execute(f"DROP FUNCTION categorys_count_products_{name.lower()}()")
+    op.execute("DROP TRIGGER categorys_paths_move ON categorys")
+    op.execute("DROP TRIGGER categorys_paths_insert ON categorys")
+    op.execute("DROP FUNCTION categorypaths_move()")
+    op.execute("DROP FUNCTION categorypaths_insert()")
+
+    op.drop_index("ix_categorypaths_descendant_id", table_name="categorypaths")
+    op.drop_table("categorypaths")
+    op.drop_index("ix_categorys_parent_id", table_name="categorys")
+    op.drop_constraint("categorys_parent_id_fkey", "categorys", type_="foreignkey")
+    op.drop_column("categorys", "in_stock_count")
+    op.drop_column("categorys", "product_count")
+    op.drop_column("categorys", "parent_id")
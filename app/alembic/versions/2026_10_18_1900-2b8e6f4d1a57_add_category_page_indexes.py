@@ -0,0 +1,64 @@
+"""Add category page indexes for products
+
+Revision ID: 2b8e6f4d1a57
+Revises: c5f19a2e7d36
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "2b8e6f4d1a57"
+down_revision: Union[str, None] = "c5f19a2e7d36"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_products_category_id_id", ["category_id", "id"]),
+    ("ix_products_category_id_price_id", ["category_id", "price", "id"]),
+    ("ix_products_category_id_name_id", ["category_id", "name", "id"]),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в таблицы, но не работает в транзакции
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(
+                name,
+                "products",
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        # Поиск по category_id (и проверку внешнего ключа при удалении
+        # категории) теперь обслуживает ix_products_category_id_id
+        op.drop_index(
+            "ix_products_category_id",
+            table_name="products",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_products_category_id",
+            "products",
+            ["category_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        for name, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name="products",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
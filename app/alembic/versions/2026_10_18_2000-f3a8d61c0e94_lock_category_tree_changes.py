@@ -0,0 +1,84 @@
+"""Serialize category tree changes with an advisory lock
+
+Revision ID: f3a8d61c0e94
+Revises: 2b8e6f4d1a57
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f3a8d61c0e94"
+down_revision: Union[str, None] = "2b8e6f4d1a57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Две параллельные переноски (A под B и B под A) по отдельности проходят
+# проверку на цикл в своих снимках. Транзакционная advisory-блокировка
+# выстраивает изменения дерева в очередь, а каждый следующий запрос функции
+# в READ COMMITTED уже видит зафиксированные изменения предыдущей
+TREE_LOCK = "PERFORM pg_advisory_xact_lock(hashtext('categorypaths'));"
+
+INSERT_FUNCTION = """
+CREATE OR REPLACE FUNCTION categorypaths_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    {lock}
+    INSERT INTO categorypaths (ancestor_id, descendant_id, depth)
+    SELECT ancestor_id, NEW.id, depth + 1
+    FROM categorypaths WHERE descendant_id = NEW.parent_id
+    UNION ALL
+    SELECT NEW.id, NEW.id, 0;
+    RETURN NULL;
+END
+$$
+"""
+
+MOVE_FUNCTION = """
+CREATE OR REPLACE FUNCTION categorypaths_move() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    {lock}
+    IF EXISTS (
+        SELECT 1 FROM categorypaths
+        WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id
+    ) THEN
+        RAISE EXCEPTION 'category % cannot be moved into its own subtree', NEW.id
+            USING ERRCODE = 'check_violation';
+    END IF;
+
+    -- Отрываем поддерево от прежних предков
+    DELETE FROM categorypaths path
+    USING categorypaths subtree
+    WHERE subtree.ancestor_id = NEW.id
+      AND path.descendant_id = subtree.descendant_id
+      AND path.ancestor_id IN (
+          SELECT ancestor_id FROM categorypaths
+          WHERE descendant_id = NEW.id AND ancestor_id <> NEW.id
+      );
+
+    -- И подвешиваем его к предкам нового родителя
+    INSERT INTO categorypaths (ancestor_id, descendant_id, depth)
+    SELECT above.ancestor_id, subtree.descendant_id, above.depth + subtree.depth + 1
+    FROM categorypaths above
+    CROSS JOIN categorypaths subtree
+    WHERE above.descendant_id = NEW.parent_id AND subtree.ancestor_id = NEW.id;
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    op.execute(INSERT_FUNCTION.format(lock=TREE_LOCK))
+    op.execute(MOVE_FUNCTION.format(lock=TREE_LOCK))
+
+
+def downgrade() -> None:
+    op.execute(INSERT_FUNCTION.format(lock=""))
+    op.execute(MOVE_FUNCTION.format(lock=""))
@@ -0,0 +1,48 @@
+"""Cascade reservations on product delete
+
+Revision ID: 7a3c9e1f5b48
+Revises: f3a8d61c0e94
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7a3c9e1f5b48"
+down_revision: Union[str, None] = "f3a8d61c0e94"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Резерв удаленного товара вместе с ним и исчезает: счетчик reserved
+    # хранится в самой строке товара. Для корзины каскада нет — ее резервы
+    # снимаются через ReservationDAO, иначе reserved товаров не уменьшится
+    op.drop_constraint(
+        "reservations_product_id_fkey", "reservations", type_="foreignkey"
+    )
+    op.create_foreign_key(
+        "reservations_product_id_fkey",
+        "reservations",
+        "products",
+        ["product_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint(
+        "reservations_product_id_fkey", "reservations", type_="foreignkey"
+    )
+    op.create_foreign_key(
+        "reservations_product_id_fkey",
+        "reservations",
+        "products",
+        ["product_id"],
+        ["id"],
+    )
@@ -1,6 +1,15 @@
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import Integer, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
 from app.database.base_dao import BaseDAO
-from app.database.models import Basket
-from app.database.models import BasketItem
+from app.database.base_db import session_scope
+from app.database.models import Basket, Product
+from app.database.models import BasketItem, Reservation
 
 
 class BasketDAO(BaseDAO):
@@ -9,3 +18,222 @@ class BasketDAO(BaseDAO):
 
 class BasketItemDAO(BasketDAO):
     model = BasketItem
+
+    @classmethod
+    async def find_lines_with_product_name(
+        cls, user_id: int, session: Optional[AsyncSession] = None
+    ):
+        """
+        Возвращает позиции корзины пользователя вместе с названиями товаров
+        и общей суммой корзины, посчитанной в SQL, одним запросом.
+        """
+        async with session_scope(session) as session:
+            query = (
+                select(
+                    Product.name.label("product_name"),
+                    BasketItem.quantity,
+                    BasketItem.price,
+                    func.sum(BasketItem.price * BasketItem.quantity)
+                    .over()
+                    .label("total_price"),
+                )
+                .join(Basket, Basket.id == BasketItem.basket_id)
+                .join(Product, Product.id == BasketItem.product_id)
+                .where(Basket.user_id == user_id)
+                .order_by(BasketItem.id)
+            )
+            result = await session.execute(query)
+            return result.mappings().all()
+
+    @classmethod
+    async def add_or_increase(
+        cls,
+        user_id: int,
+        product_id: int,
+        quantity: int,
+        session: Optional[AsyncSession] = None,
+    ):
+        """
+        Атомарно резервирует товар и добавляет его в корзину пользователя (или
+        увеличивает количество): UPDATE products резервирует недостающее
+        количество, если столько доступно, затем INSERT ... ON CONFLICT
+        обновляет позицию корзины и резерв с новым сроком. Резерв всегда
+        покрывает всю позицию: если прежний истек и снят, резервируется
+        все количество в корзине, а не только добавка. Возвращает строку
+        позиции корзины либо None, если товар не найден или его недостаточно.
+        """
+        if quantity <= 0:
+            raise ValueError("quantity must be positive")
+
+        # Строка корзины (FOR NO KEY UPDATE не мешает внешним ключам позиций)
+        # выстраивает параллельные добавления пользователя в очередь
+        lock_basket = (
+            select(Basket.id).filter_by(user_id=user_id).with_for_update(key_share=True)
+        )
+        async with session_scope(session) as session:
+            basket_id = await session.scalar(lock_basket)
+            if basket_id is None:
+                return None
+
+            # Существующий резерв блокируется раньше товара — в том же порядке,
+            # что при оформлении заказа и снятии резервов
+            held = await session.scalar(
+                select(Reservation.quantity)
+                .filter_by(basket_id=basket_id, product_id=product_id)
+                .with_for_update()
+            )
+            # Позиция читается после блокировок, уже отдельным снимком
+            in_basket = await session.scalar(
+                select(BasketItem.quantity).filter_by(
+                    basket_id=basket_id, product_id=product_id
+                )
+            )
+            shortage = max((in_basket or 0) + quantity - (held or 0), 0)
+            result = await session.execute(
+                cls._reserve_and_add(basket_id, product_id, quantity, shortage)
+            )
+            return result.mappings().one_or_none()
+
+    @staticmethod
+    def _reserve_and_add(basket_id: int, product_id: int, quantity: int, shortage: int):
+        """
+        Строит запрос из CTE: резерв shortage единиц товара, добавление
+        quantity в позицию корзины и увеличение ее резерва на shortage.
+        """
+        reserve = (
+            update(Product)
+            .where(
+                Product.id == product_id,
+                Product.quantity - Product.reserved >= shortage,
+            )
+            .values(reserved=Product.reserved + shortage)
+            .returning(Product.id, Product.price)
+            .cte("reserve")
+        )
+
+        item_insert = pg_insert(BasketItem).from_select(
+            ["basket_id", "product_id", "quantity", "price"],
+            select(
+                literal(basket_id, Integer),
+                reserve.c.id,
+                literal(quantity, Integer),
+                reserve.c.price,
+            ),
+        )
+        item = (
+            item_insert.on_conflict_do_update(
+                constraint="uq_task_user_permission",
+                set_={"quantity": BasketItem.quantity + item_insert.excluded.quantity},
+            )
+            .returning(*BasketItem.__table__.columns)
+            .cte("item")
+        )
+
+        reservation_insert = pg_insert(Reservation).from_select(
+            ["basket_id", "product_id", "quantity", "expires_at"],
+            select(
+                item.c.basket_id,
+                item.c.product_id,
+                literal(shortage, Integer),
+                func.now() + timedelta(seconds=settings.RESERVATION_TTL),
+            ),
+        )
+        reservation = (
+            reservation_insert.on_conflict_do_update(
+                constraint="uq_reservations_basket_product",
+                set_={
+                    "quantity": Reservation.quantity
+                    + reservation_insert.excluded.quantity,
+                    "expires_at": reservation_insert.excluded.expires_at,
+                },
+            )
+            .returning(Reservation.id)
+            .cte("reservation")
+        )
+
+        return select(item).add_cte(reservation)
+
+
+class ReservationDAO(BaseDAO):
+    model = Reservation
+
+    @classmethod
+    async def release(
+        cls,
+        basket_id: int,
+        product_id: int,
+        keep: int = 0,
+        session: Optional[AsyncSession] = None,
+    ):
+        """
+        Уменьшает резерв позиции корзины до keep (при 0 удаляет его)
+        и возвращает освободившееся количество в доступный остаток.
+        """
+        async with session_scope(session) as session:
+            reserved = await session.scalar(
+                select(Reservation.quantity)
+                .filter_by(basket_id=basket_id, product_id=product_id)
+                .with_for_update()
+            )
+            if reserved is None or reserved <= keep:
+                return
+
+            if keep > 0:
+                await session.execute(
+                    update(Reservation)
+                    .filter_by(basket_id=basket_id, product_id=product_id)
+                    .values(quantity=keep)
+                )
+            else:
+                await session.execute(
+                    delete(Reservation).filter_by(
+                        basket_id=basket_id, product_id=product_id
+                    )
+                )
+            await session.execute(
+                update(Product)
+                .filter_by(id=product_id)
+                .values(reserved=Product.reserved - (reserved - keep))
+            )
+
+    @classmethod
+    async def release_expired(
+        cls, limit: int = 1000, session: Optional[AsyncSession] = None
+    ) -> int:
+        """
+        Удаляет до limit просроченных резервов и возвращает их количество
+        в остатки одним запросом. Строки, заблокированные оформлением заказа,
+        пропускаются (SKIP LOCKED). Возвращает число снятых резервов.
+        """
+        batch = (
+            select(Reservation.id)
+            .where(Reservation.expires_at < func.now())
+            .order_by(Reservation.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        expired = (
+            delete(Reservation)
+            .where(Reservation.id.in_(batch.scalar_subquery()))
+            .returning(Reservation.product_id, Reservation.quantity)
+            .cte("expired")
+        )
+        totals = (
+            select(
+                expired.c.product_id,
+                func.count().label("reservations"),
+                func.sum(expired.c.quantity).label("quantity"),
+            )
+            .group_by(expired.c.product_id)
+            .cte("totals")
+        )
+        released = (
+            update(Product)
+            .where(Product.id == totals.c.product_id)
+            .values(reserved=Product.reserved - totals.c.quantity)
+            .returning(totals.c.reservations)
+            .cte("released")
+        )
+        query = select(func.coalesce(func.sum(released.c.reservations), 0))
+        async with session_scope(session) as session:
+            return await session.scalar(query)
@@ -1,9 +1,11 @@
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.basket.dao import BasketDAO, BasketItemDAO
+from app.basket.dao import BasketDAO, BasketItemDAO, ReservationDAO
 from app.basket.schemas import BasketItemRead, BasketItemMiniRead
+from app.database.base_db import get_session
 from app.product.dao import ProductDAO
 from app.user.dependencies import get_current_user
 from app.user.schemas import UserRead
@@ -13,76 +15,58 @@ router_basket = APIRouter(prefix="/basket", tags=["Basket"])
 
 @router_basket.post("/add_in_basket/{product_id}")
 async def add_in_basket(
-    product_id: int, quantity: int = 1, user: UserRead = Depends(get_current_user)
+    product_id: int,
+    quantity: int = Query(1, ge=1),
+    user: UserRead = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ) -> BasketItemRead:
     """
     Эта функция добавляет указанный товар в корзину пользователя. Если товар уже
-    находится в корзине, увеличивает его количество. Если товара на складе недостаточно,
-    возвращает ошибку.
+    находится в корзине, увеличивает его количество. Добавленное количество
+    резервируется на складе на RESERVATION_TTL секунд. Если товара на складе
+    недостаточно, возвращает ошибку.
     """
-    basket = await BasketDAO.find_one_or_none(user_id=user.id)
-    product = await ProductDAO.find_one_or_none(id=product_id)
+    # Резервируем товар и добавляем его в корзину одним атомарным запросом
+    basket_item = await BasketItemDAO.add_or_increase(
+        user.id, product_id, quantity, session
+    )
+    if basket_item:
+        return basket_item
+
+    # Запрос не изменил корзину: выясняем причину для ответа клиенту
+    product = await ProductDAO.find_one_or_none(session, id=product_id)
 
     # Если продукт не найден, возвращаем ошибку 404
     if not product:
         raise HTTPException(status_code=404, detail="Товар не найден")
 
-    # Если запрашиваемое количество товара превышает его наличие на складе, возвращаем ошибку 400
-    if product.quantity <= quantity:
-        raise HTTPException(
-            status_code=400, detail=f"Недостаточно товара {product.name} на складе"
-        )
-
-    # Ищем элемент корзины, который соответствует данному товару и корзине пользователя
-    basket_item = await BasketItemDAO.find_one_or_none(
-        basket_id=basket.id, product_id=product.id
+    # Иначе товара на складе недостаточно, возвращаем ошибку 400
+    raise HTTPException(
+        status_code=400, detail=f"Недостаточно товара {product.name} на складе"
     )
 
-    # Если элемент корзины не найден, создаем новый элемент
-    if not basket_item:
-        new_basket_item = await BasketItemDAO.add(
-            basket_id=basket.id,
-            product_id=product.id,
-            quantity=quantity,
-            price=product.price,
-        )
-        # Возвращаем созданный элемент корзины
-        return await BasketItemDAO.find_one_or_none(id=new_basket_item["id"])
-    else:
-        # Если элемент корзины уже существует, проверяем,
-        # хватает ли товара на складе для добавления количества
-        if product.quantity >= basket_item.quantity + quantity:
-            # Обновляем количество товара в корзине
-            update_quantity = await BasketItemDAO.update(
-                basket_item.id, quantity=basket_item.quantity + quantity
-            )
-            # Возвращаем обновленный элемент корзины
-            return await BasketItemDAO.find_one_or_none(id=update_quantity["id"])
-        else:
-            # Если товара не хватает, возвращаем ошибку 400
-            raise HTTPException(
-                status_code=400, detail=f"Недостаточно товара {product.name} на складе"
-            )
-
 
 @router_basket.get("/get_basket_items")
-async def get_items_from_basket(user: UserRead = Depends(get_current_user)):
+async def get_items_from_basket(
+    user: UserRead = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
     """
     Эта функция извлекает все товары из корзины текущего пользователя,
     рассчитывает общую суммуи возвращает список товаров с информацией о каждом товаре.
     """
-    basket = await BasketDAO.find_one_or_none(user_id=user.id)
-    basket_items = await BasketItemDAO.find_all(basket_id=basket.id)
+    # Получаем позиции корзины с названиями товаров и общей суммой одним запросом
+    basket_items = await BasketItemDAO.find_lines_with_product_name(user.id, session)
 
-    # Рассчитываем общую сумму всех товаров в корзине
-    total_price = sum(item.price * item.quantity for item in basket_items)
+    # Общая сумма посчитана в SQL и одинакова для каждой строки
+    total_price = basket_items[0]["total_price"] if basket_items else 0
 
     # Создаем список объектов, содержащих информацию о товарах в корзине
     basket_items_read = [
         BasketItemMiniRead(
-            product_name=(await ProductDAO.find_one_or_none(id=item.product_id)).name,
-            quantity=item.quantity,
-            price=item.price,
+            product_name=item["product_name"],
+            quantity=item["quantity"],
+            price=item["price"],
         )
         for item in basket_items
     ]
@@ -93,44 +77,55 @@ async def get_items_from_basket(user: UserRead = Depends(get_current_user)):
 
 @router_basket.patch("/decrease_quantity/{basket_item_id}")
 async def decrease_quantity(
-    product_id: int, quantity: int = 1, user: UserRead = Depends(get_current_user)
+    product_id: int,
+    quantity: int = Query(1, ge=1),
+    user: UserRead = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ) -> Optional[BasketItemRead]:
     """
     Эта функция уменьшает количество указанного товара в корзине пользователя.
     Если количество уменьшается до нуля или ниже, товар удаляется из корзины.
     """
-    basket = await BasketDAO.find_one_or_none(user_id=user.id)
+    basket = await BasketDAO.find_one_or_none(session, user_id=user.id)
     basket_item = await BasketItemDAO.find_one_or_none(
-        product_id=product_id, basket_id=basket.id
+        session, product_id=product_id, basket_id=basket.id
     )
     if basket_item is None:
         raise HTTPException(status_code=404, detail="Товар в корзине не найден")
         # Рассчитываем новое количество товара после уменьшения
     new_quantity = basket_item.quantity - quantity
 
+    # Резерв не должен превышать количество в корзине
+    await ReservationDAO.release(basket.id, product_id, max(new_quantity, 0), session)
+
     # Если новое количество меньше или равно нулю, удаляем товар из корзины
     if new_quantity <= 0:
-        await BasketItemDAO.delete(product_id=product_id, basket_id=basket.id)
+        await BasketItemDAO.delete(session, product_id=product_id, basket_id=basket.id)
         return None  # Возвращаем None, чтобы указать, что товар был удален
     else:
         # Если количество товара все еще положительное, обновляем его в базе данных
         update_quantity = await BasketItemDAO.update(
-            basket_item.id, quantity=new_quantity
+            basket_item.id, session, quantity=new_quantity
         )
         # Возвращаем обновленный элемент корзины
-        return await BasketItemDAO.find_one_or_none(id=update_quantity["id"])
+        return await BasketItemDAO.find_one_or_none(session, id=update_quantity["id"])
 
 
 @router_basket.delete("/delete_from_basket/{product_id}")
-async def delete_in_basket(product_id: int, user: UserRead = Depends(get_current_user)):
+async def delete_in_basket(
+    product_id: int,
+    user: UserRead = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
     """
     Эта функция удаляет товар из корзины пользователя.
     """
-    basket = await BasketDAO.find_one_or_none(user_id=user.id)
+    basket = await BasketDAO.find_one_or_none(session, user_id=user.id)
     product = await BasketItemDAO.find_one_or_none(
-        product_id=product_id, basket_id=basket.id
+        session, product_id=product_id, basket_id=basket.id
     )
     if not product:
         raise HTTPException(status_code=404, detail="В корзине нет такого продукта")
-    await BasketItemDAO.delete(product_id=product_id, basket_id=basket.id)
+    await ReservationDAO.release(basket.id, product_id, session=session)
+    await BasketItemDAO.delete(session, product_id=product_id, basket_id=basket.id)
     return {"process": True}
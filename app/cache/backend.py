@@ -0,0 +1,230 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi_cache.backends.redis import RedisBackend
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCache:
+    """
+    Ограниченный по числу записей и объему LRU-кэш с TTL в памяти процесса.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Optional[Tuple[int, bytes]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            self._pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return math.ceil(expires_at - now), value
+
+    def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        # Запись в памяти не должна жить дольше, чем в Redis
+        ttl = self.ttl if expire is None or expire < 0 else min(expire, self.ttl)
+        if ttl <= 0 or len(value) > self.max_bytes:
+            return
+        self._pop(key)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._bytes += len(value)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def evict(self, namespace: Optional[str] = None, key: Optional[str] = None) -> None:
+        if namespace:
+            prefix = f"{namespace}:"
+            for name in [name for name in self._entries if name.startswith(prefix)]:
+                self._pop(name)
+        if key:
+            self._pop(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+
+# Записывает значение и добавляет ключ в индексы его подпространств имен.
+# Индекс живет не меньше самого долгоживущего ключа в нем. Ключи, истекшие
+# по TTL, остаются в индексе, поэтому каждая запись проверяет несколько
+# случайных элементов и удаляет те, ключей которых уже нет
+_SET_INDEXED = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+for i = 2, #KEYS do
+    for _, member in ipairs(redis.call('SRANDMEMBER', KEYS[i], ARGV[3])) do
+        if redis.call('EXISTS', member) == 0 then
+            redis.call('SREM', KEYS[i], member)
+        end
+    end
+    redis.call('SADD', KEYS[i], KEYS[1])
+    if redis.call('TTL', KEYS[i]) < tonumber(ARGV[2]) then
+        redis.call('EXPIRE', KEYS[i], ARGV[2])
+    end
+end
+"""
+
+
+class TwoTierBackend(RedisBackend):
+    """
+    Бэкенд fastapi-cache с двумя уровнями: LRU/TTL-кэш в памяти воркера (L1)
+    перед Redis (L2). Очистка кэша рассылается всем воркерам через Redis pub/sub,
+    и каждый воркер удаляет соответствующие записи из своего L1.
+
+    Через тот же канал очищаются и другие кэши в памяти (register_local),
+    например кэш пользователей.
+
+    Для namespace и scope ключа (product-list и product-list:category:5)
+    Redis хранит множество его ключей, поэтому очистка читает только свой
+    индекс, а не сканирует всю базу.
+    """
+
+    channel = "fastapi-cache:invalidate"
+    index_prefix = "fastapi-cache-index"
+    batch_size = 500
+    # Сколько элементов индекса проверяется на истечение при каждой записи
+    prune_sample = 2
+
+    def __init__(self, redis, max_entries: int, max_bytes: int, ttl: int):
+        super().__init__(redis)
+        self.local = LocalCache(max_entries, max_bytes, ttl)
+        # Другие кэши в памяти воркера, очистка которых рассылается по тому же каналу
+        self.local_caches: dict[str, LocalCache] = {}
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry
+        ttl, value = await super().get_with_ttl(key)
+        if value is not None:
+            self.local.set(key, value, ttl)
+        return ttl, value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self.get_with_ttl(key))[1]
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        if expire is None or expire <= 0:
+            # Без TTL индекс пришлось бы хранить вечно
+            await super().set(key, value, expire)
+        else:
+            indexes = [self.index_key(namespace) for namespace in namespaces_of(key)]
+            await self.redis.eval(
+                _SET_INDEXED,
+                1 + len(indexes),
+                key,
+                *indexes,
+                value,
+                expire,
+                self.prune_sample,
+            )
+        self.local.set(key, value, expire)
+
+    async def clear(
+        self, namespace: Optional[str] = None, key: Optional[str] = None
+    ) -> int:
+        removed = 0
+        if namespace:
+            index = self.index_key(namespace)
+            batch = []
+            async for name in self.redis.sscan_iter(index, count=self.batch_size):
+                batch.append(name.decode() if isinstance(name, bytes) else name)
+                if len(batch) >= self.batch_size:
+                    removed += await self.unlink_indexed(batch)
+                    batch = []
+            if batch:
+                removed += await self.unlink_indexed(batch)
+            await self.redis.unlink(index)
+        elif key:
+            removed = await self.unlink_indexed([key])
+
+        self.local.evict(namespace, key)
+        await self.redis.publish(
+            self.channel, json.dumps({"namespace": namespace, "key": key})
+        )
+        return removed
+
+    def register_local(self, name: str, cache: LocalCache) -> None:
+        self.local_caches[name] = cache
+
+    async def evict_local(self, name: str, key: str) -> None:
+        """
+        Удаляет ключ из зарегистрированного кэша name во всех воркерах.
+        """
+        self.local_caches[name].evict(key=key)
+        await self.redis.publish(self.channel, json.dumps({"cache": name, "key": key}))
+
+    def index_key(self, namespace: str) -> str:
+        return f"{self.index_prefix}:{namespace}"
+
+    async def unlink_indexed(self, keys: list[str]) -> int:
+        """
+        Удаляет ключи вместе с их записями в индексах подпространств имен.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.unlink(*keys)
+            for key in keys:
+                for namespace in namespaces_of(key):
+                    pipe.srem(self.index_key(namespace), key)
+            return (await pipe.execute())[0]
+
+    async def listen_invalidations(self) -> None:
+        """
+        Слушает канал инвалидации и удаляет записи из L1. При потере соединения
+        L1 сбрасывается целиком, так как сообщения могли быть пропущены.
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        data = json.loads(message["data"])
+                        if "cache" in data:
+                            cache = self.local_caches.get(data["cache"])
+                            if cache is not None:
+                                cache.evict(key=data["key"])
+                        else:
+                            self.local.evict(data.get("namespace"), data.get("key"))
+            except RedisError:
+                logger.warning("Cache invalidation channel lost", exc_info=True)
+                self.local.clear()
+                for cache in self.local_caches.values():
+                    cache.clear()
+                await asyncio.sleep(1)
+
+
+def namespaces_of(key: str) -> list[str]:
+    """
+    Возвращает очищаемые подпространства имен ключа <префикс>:<namespace>:
+    <scope>:<хеш> (см. scoped_key_builder): namespace целиком и scope. Общий
+    префикс и промежуточные части scope не индексируются, поэтому их очистка
+    ничего не удаляет: для "fastapi-cache:product-list:category:5:<хеш>" это
+    "fastapi-cache:product-list" и "fastapi-cache:product-list:category:5".
+    """
+    parts = key.split(":")
+    if len(parts) < 3:
+        return []
+    return list(dict.fromkeys([":".join(parts[:2]), ":".join(parts[:-1])]))
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from decimal import Decimal
+from functools import partial, wraps
+from typing import Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi_cache import FastAPICache
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.database.base_db import primary_pinned
+from app.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Загрузки по промаху, выполняющиеся в этом воркере, по ключу кэша
+_inflight: dict[str, asyncio.Task] = {}
+
+# Фоновые обновления устаревших значений по ключу кэша (ссылки держим, чтобы
+# задачи не собрал GC). Они хранятся отдельно от _inflight: обновление
+# возвращает None, если значение загружает другой воркер, и этот результат
+# нельзя отдавать запросу с промахом
+_refreshing: dict[str, asyncio.Task] = {}
+
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def cached(
+    namespace: str,
+    key_builder,
+    expire: Optional[int] = None,
+    stale_ttl: Optional[int] = None,
+):
+    """
+    Кэширует результат эндпоинта в бэкенде FastAPICache с защитой от
+    «лавины» промахов:
+
+    - single-flight: в одном воркере на ключ выполняется одна загрузка,
+      остальные запросы ждут ее результат;
+    - распределенная блокировка в Redis: между воркерами значение загружает
+      только владелец блокировки, остальные ждут его появления в кэше;
+    - stale-while-revalidate: в течение stale_ttl после устаревания отдается
+      старое значение, а одна фоновая задача его обновляет.
+
+    Значения для кэша загружаются с primary, даже если эндпоинт читает
+    с реплики (read_only=True).
+    """
+
+    def wrapper(func):
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            if not FastAPICache.get_enable():
+                return await func(*args, **kwargs)
+
+            fresh_ttl = expire or settings.CACHE_PRODUCT_TTL
+            stale = settings.CACHE_STALE_TTL if stale_ttl is None else stale_ttl
+            backend = FastAPICache.get_backend()
+            key = key_builder(
+                func,
+                f"{FastAPICache.get_prefix()}:{namespace}",
+                args=args,
+                kwargs=kwargs,
+            )
+
+            async def load():
+                # Значение живет в кэше весь TTL, поэтому читаем его с primary:
+                # отстающая реплика вернула бы остатки до последнего изменения.
+                # load выполняется в своей задаче, запрос это не затрагивает
+                primary_pinned.set(True)
+                value = await func(*args, **kwargs)
+                envelope = {
+                    "fresh_until": time.time() + fresh_ttl,
+                    "value": jsonable_encoder(value, custom_encoder={Decimal: str}),
+                }
+                try:
+                    await backend.set(
+                        key, json.dumps(envelope).encode(), fresh_ttl + stale
+                    )
+                except RedisError:
+                    logger.warning("Cannot store cache key %s", key, exc_info=True)
+                return envelope["value"]
+
+            try:
+                raw = await backend.get(key)
+            except RedisError:
+                logger.warning("Cannot read cache key %s", key, exc_info=True)
+                CACHE_REQUESTS.labels(namespace, "miss").inc()
+                return await func(*args, **kwargs)
+
+            if raw is None:
+                CACHE_REQUESTS.labels(namespace, "miss").inc()
+                return await _single_flight(key, backend, load)
+
+            envelope = json.loads(raw)
+            if envelope["fresh_until"] >= time.time():
+                CACHE_REQUESTS.labels(namespace, "hit").inc()
+                return envelope["value"]
+
+            CACHE_REQUESTS.labels(namespace, "stale").inc()
+            if key not in _inflight and key not in _refreshing:
+                # Значение устарело: отдаем его сразу, обновляем в фоне
+                task = asyncio.create_task(
+                    _load_with_lock(key, backend, load, wait_for_cache=False)
+                )
+                _refreshing[key] = task
+                task.add_done_callback(partial(_refresh_done, key))
+            return envelope["value"]
+
+        return inner
+
+    return wrapper
+
+
+async def _single_flight(key: str, backend, load):
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(
+            _load_with_lock(key, backend, load, wait_for_cache=True)
+        )
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: отмена одного ожидающего запроса не отменяет общую загрузку
+    return await asyncio.shield(task)
+
+
+async def _load_with_lock(key: str, backend, load, wait_for_cache: bool):
+    redis = getattr(backend, "redis", None)
+    if redis is None or not settings.CACHE_DISTRIBUTED_LOCK:
+        return await load()
+
+    lock_key = f"lock:{key}"
+    token = uuid.uuid4().hex
+    try:
+        acquired = await redis.set(
+            lock_key, token, nx=True, px=int(settings.CACHE_LOCK_TIMEOUT * 1000)
+        )
+    except RedisError:
+        logger.warning("Cannot acquire cache lock %s", lock_key, exc_info=True)
+        return await load()
+
+    if not acquired:
+        if not wait_for_cache:
+            # Фоновое обновление уже выполняет другой воркер
+            return None
+        # Ждем, пока владелец блокировки положит значение в кэш
+        deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            try:
+                raw = await backend.get(key)
+            except RedisError:
+                logger.warning("Cannot read cache key %s", key, exc_info=True)
+                break
+            if raw is not None:
+                return json.loads(raw)["value"]
+        return await load()
+
+    try:
+        return await load()
+    finally:
+        try:
+            await redis.eval(_RELEASE_LOCK, 1, lock_key, token)
+        except RedisError:
+            logger.warning("Cannot release cache lock %s", lock_key, exc_info=True)
+
+
+def _refresh_done(key: str, task: asyncio.Task) -> None:
+    _refreshing.pop(key, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Cache refresh failed", exc_info=task.exception())
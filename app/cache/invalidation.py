@@ -0,0 +1,73 @@
+import hashlib
+import logging
+from typing import Iterable, Mapping
+
+from fastapi_cache import FastAPICache
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_NAMESPACE = "product"
+PRODUCT_LIST_NAMESPACE = "product-list"
+CATEGORY_NAMESPACE = "category"
+
+
+def scoped_key_builder(scope: str):
+    """
+    Строит ключи вида <namespace>:<scope>:<хеш параметров>, где scope -
+    шаблон из параметров эндпоинта (например "{product_id}"). Благодаря этому
+    кэш одного товара или категории очищается по своему подпространству имен.
+    """
+
+    def key_builder(
+        func, namespace: str = "", *, request=None, response=None, args=(), kwargs
+    ) -> str:
+        params = f"{func.__module__}:{func.__name__}:{args}:{sorted(kwargs.items())}"
+        digest = hashlib.md5(params.encode()).hexdigest()
+        return f"{namespace}:{scope.format(**kwargs)}:{digest}"
+
+    return key_builder
+
+
+async def clear_namespaces(namespaces: Iterable[str]) -> None:
+    """
+    Очищает подпространства имен кэша. Ошибки Redis не прерывают запрос,
+    который уже зафиксировал изменения в базе данных.
+    """
+    try:
+        FastAPICache.get_backend()
+    except AssertionError:
+        # Кэш не инициализирован (например, в Celery или CLI)
+        return
+    for namespace in namespaces:
+        try:
+            await FastAPICache.clear(namespace=namespace)
+        except RedisError:
+            logger.warning("Cannot clear cache namespace %s", namespace, exc_info=True)
+
+
+async def invalidate_products(products: Iterable[Mapping]) -> None:
+    """
+    Очищает кэш карточек товаров, страниц их категорий, общих списков
+    и счетчиков поиска.
+    Каждый элемент должен содержать id и category_id товара.
+    """
+    namespaces = {f"{PRODUCT_LIST_NAMESPACE}:all", f"{PRODUCT_LIST_NAMESPACE}:search"}
+    for product in products:
+        namespaces.add(f"{PRODUCT_NAMESPACE}:{product['id']}")
+        namespaces.add(f"{PRODUCT_LIST_NAMESPACE}:category:{product['category_id']}")
+    await clear_namespaces(namespaces)
+
+
+async def invalidate_product_lists() -> None:
+    """
+    Очищает все закэшированные списки товаров, включая страницы категорий.
+    """
+    await clear_namespaces([PRODUCT_LIST_NAMESPACE])
+
+
+async def invalidate_categories() -> None:
+    """
+    Очищает закэшированное дерево категорий и пути к ним.
+    """
+    await clear_namespaces([CATEGORY_NAMESPACE])
@@ -0,0 +1,169 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import Integer, String, any_, bindparam, func, insert, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.cache.invalidation import invalidate_categories
+from app.database.base_dao import BaseDAO
+from app.database.base_db import after_commit, session_scope
+from app.database.models import Category, CategoryPath
+from app.exception.category_exceptions import (
+    CategoryCycleError,
+    CategoryNotFoundError,
+)
+
+# SQLSTATE нарушения внешнего ключа и проверки на цикл в триггере дерева
+FOREIGN_KEY_VIOLATION = "23503"
+CHECK_VIOLATION = "23514"
+
+CATEGORY_COLUMNS = (
+    Category.id,
+    Category.name,
+    Category.parent_id,
+    Category.product_count,
+    Category.in_stock_count,
+)
+
+
+class CategoryDAO(BaseDAO):
+    model = Category
+
+    @classmethod
+    async def ids_by_name(
+        cls, names: Iterable[str], session: Optional[AsyncSession] = None
+    ) -> dict[str, int]:
+        """
+        Возвращает id категорий по названиям, создавая недостающие.
+        Для повторяющихся названий берется категория с меньшим id.
+        """
+        names = list(set(names))
+        if not names:
+            return {}
+        query = (
+            select(Category.name, func.min(Category.id))
+            .where(
+                Category.name == any_(bindparam("names", names, type_=ARRAY(String)))
+            )
+            .group_by(Category.name)
+        )
+        async with session_scope(session) as session:
+            found = dict((await session.execute(query)).all())
+            missing = [name for name in names if name not in found]
+            if missing:
+                result = await session.execute(
+                    insert(Category)
+                    .values([{"name": name} for name in missing])
+                    .returning(Category.name, Category.id)
+                )
+                found.update(result.all())
+            return found
+
+    @classmethod
+    async def existing_ids(
+        cls, ids: Iterable[int], session: Optional[AsyncSession] = None
+    ) -> set[int]:
+        """
+        Возвращает те из переданных id, для которых категория существует.
+        """
+        ids = list(set(ids))
+        if not ids:
+            return set()
+        query = select(Category.id).where(
+            Category.id == any_(bindparam("ids", ids, type_=ARRAY(Integer)))
+        )
+        async with session_scope(session) as session:
+            return set((await session.execute(query)).scalars())
+
+    @classmethod
+    async def tree(cls, session: Optional[AsyncSession] = None) -> list[dict]:
+        """
+        Возвращает дерево категорий. Счетчики поддеревьев суммируются одним
+        запросом по таблице замыкания, без чтения товаров.
+        """
+        descendant = aliased(Category)
+        query = (
+            select(
+                *CATEGORY_COLUMNS,
+                func.sum(descendant.product_count).label("total_count"),
+                func.sum(descendant.in_stock_count).label("total_in_stock"),
+            )
+            .join(CategoryPath, CategoryPath.ancestor_id == Category.id)
+            .join(descendant, descendant.id == CategoryPath.descendant_id)
+            .group_by(Category.id)
+            .order_by(Category.name, Category.id)
+        )
+        async with session_scope(session, read_only=True) as session:
+            rows = (await session.execute(query)).mappings().all()
+
+        nodes = {row["id"]: {**row, "children": []} for row in rows}
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node["parent_id"])
+            (parent["children"] if parent else roots).append(node)
+        return roots
+
+    @classmethod
+    async def path(cls, category_id: int, session: Optional[AsyncSession] = None):
+        """
+        Возвращает цепочку категорий от корня до указанной (для «хлебных
+        крошек»); пустой список, если категории нет.
+        """
+        query = (
+            select(*CATEGORY_COLUMNS)
+            .join(CategoryPath, CategoryPath.ancestor_id == Category.id)
+            .where(CategoryPath.descendant_id == category_id)
+            .order_by(CategoryPath.depth.desc())
+        )
+        async with session_scope(session, read_only=True) as session:
+            result = await session.execute(query)
+            return result.mappings().all()
+
+    @classmethod
+    async def create(
+        cls,
+        name: str,
+        parent_id: Optional[int] = None,
+        session: Optional[AsyncSession] = None,
+    ):
+        query = (
+            insert(Category)
+            .values(name=name, parent_id=parent_id)
+            .returning(*CATEGORY_COLUMNS)
+        )
+        return await cls._write(query, session)
+
+    @classmethod
+    async def update(
+        cls, category_id: int, session: Optional[AsyncSession] = None, **data
+    ):
+        """
+        Переименовывает категорию и/или переносит ее к другому родителю
+        (parent_id=None делает ее корнем). Таблицу замыкания перестраивает
+        триггер; перенос в собственное поддерево отклоняется.
+        """
+        query = (
+            update(Category)
+            .filter_by(id=category_id)
+            .values(**data)
+            .returning(*CATEGORY_COLUMNS)
+        )
+        return await cls._write(query, session)
+
+    @classmethod
+    async def _write(cls, query, session: Optional[AsyncSession]):
+        async with session_scope(session) as session:
+            try:
+                category = (await session.execute(query)).mappings().one_or_none()
+            except IntegrityError as error:
+                if error.orig.sqlstate == CHECK_VIOLATION:
+                    raise CategoryCycleError
+                if error.orig.sqlstate == FOREIGN_KEY_VIOLATION:
+                    raise CategoryNotFoundError
+                raise
+            if category is None:
+                raise CategoryNotFoundError
+            after_commit(session, invalidate_categories)
+            return category
@@ -1 +1,77 @@
+from fastapi import APIRouter, Depends, HTTPException
 
+from app.cache.decorator import cached
+from app.cache.invalidation import CATEGORY_NAMESPACE, scoped_key_builder
+from app.category.dao import CategoryDAO
+from app.category.schemas import (
+    CategoryCreate,
+    CategoryNode,
+    CategoryRead,
+    CategoryUpdate,
+)
+from app.config import settings
+from app.exception.category_exceptions import CategoryCycleError, CategoryNotFoundError
+from app.user.dependencies import get_current_admin
+
+router_category = APIRouter(prefix="/category", tags=["Category"])
+
+
+@router_category.get("/tree")
+@cached(
+    CATEGORY_NAMESPACE,
+    scoped_key_builder("tree"),
+    expire=settings.CACHE_CATEGORY_TREE_TTL,
+)
+async def get_category_tree() -> list[CategoryNode]:
+    """
+    Эта функция возвращает дерево категорий с числом товаров (всего и в наличии)
+    в каждой категории и во всем ее поддереве. Результат кэшируется; счетчики
+    обновляются не реже CACHE_CATEGORY_TREE_TTL секунд.
+    """
+    return await CategoryDAO.tree()
+
+
+@router_category.get("/{category_id}/path")
+@cached(
+    CATEGORY_NAMESPACE,
+    scoped_key_builder("path"),
+    expire=settings.CACHE_CATEGORY_TREE_TTL,
+)
+async def get_category_path(category_id: int) -> list[CategoryRead]:
+    """
+    Эта функция возвращает цепочку категорий от корня до указанной.
+    """
+    path = await CategoryDAO.path(category_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Категория не найдена")
+    return path
+
+
+@router_category.post("", dependencies=[Depends(get_current_admin)])
+async def create_category(category: CategoryCreate) -> CategoryRead:
+    """
+    Эта функция создает категорию, при указании parent_id - внутри родительской.
+    """
+    try:
+        return await CategoryDAO.create(category.name, category.parent_id)
+    except CategoryNotFoundError:
+        raise HTTPException(status_code=404, detail="Родительская категория не найдена")
+
+
+@router_category.patch("/{category_id}", dependencies=[Depends(get_current_admin)])
+async def update_category(category_id: int, category: CategoryUpdate) -> CategoryRead:
+    """
+    Эта функция переименовывает категорию или переносит ее к другому родителю
+    (parent_id: null делает категорию корневой).
+    """
+    data = category.model_dump(exclude_unset=True)
+    if not data:
+        raise HTTPException(status_code=400, detail="Нет полей для изменения")
+    try:
+        return await CategoryDAO.update(category_id, **data)
+    except CategoryNotFoundError:
+        raise HTTPException(status_code=404, detail="Категория не найдена")
+    except CategoryCycleError:
+        raise HTTPException(
+            status_code=400, detail="Нельзя перенести категорию в ее подкатегорию"
+        )
@@ -0,0 +1,36 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+
+class CategoryRead(BaseModel):
+    id: int
+    name: str
+    parent_id: Optional[int]
+    product_count: int
+    in_stock_count: int
+
+
+class CategoryNode(CategoryRead):
+    # Товары категории вместе со всеми подкатегориями
+    total_count: int
+    total_in_stock: int
+    children: list["CategoryNode"]
+
+
+class CategoryCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=60)
+    parent_id: Optional[int] = None
+
+
+class CategoryUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=60)
+    parent_id: Optional[int] = None
+
+    @field_validator("name")
+    @classmethod
+    def check_name(cls, name: Optional[str]) -> str:
+        # Название можно не передавать, но нельзя стереть
+        if name is None:
+            raise ValueError("name cannot be null")
+        return name
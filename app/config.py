@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv
 
@@ -6,6 +8,22 @@ load_dotenv()
 
 class Settings(BaseSettings):
     DB_URL: str
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = False
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Таймаут запроса на стороне сервера в мс (0 — без ограничения).
+    # С DB_PGBOUNCER не применяется: задайте его на роли базы данных
+    # (ALTER ROLE ... SET statement_timeout = ...)
+    DB_STATEMENT_TIMEOUT: int = 0
+    # Работа через PgBouncer в режиме transaction pooling
+    DB_PGBOUNCER: bool = False
+    # Реплика для чтения каталога (не задана — все запросы идут в primary)
+    DB_REPLICA_URL: Optional[str] = None
+    DB_REPLICA_MAX_LAG: float = 1.0
+    DB_REPLICA_LAG_CHECK_INTERVAL: float = 1.0
 
     ADMIN_EMAIL: str
     SECRET_KEY: str
@@ -15,6 +33,53 @@ class Settings(BaseSettings):
     SMTP_PORT: int
     SMTP_USERNAME: str
     SMTP_PASSWORD: str
+    SMTP_USE_SSL: bool = True
+    SMTP_TIMEOUT: float = 30.0
+    # Соединение переоткрывается после стольких писем или простоя (секунды)
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100
+    SMTP_IDLE_TIMEOUT: float = 60.0
+
+    # Пакетная отправка писем из очереди в Redis
+    MAIL_BATCH_SIZE: int = 100
+    MAIL_RATE_LIMIT_PER_MINUTE: int = 600
+    MAIL_MAX_RETRIES: int = 5
+    MAIL_RETRY_BACKOFF: int = 30
+    MAIL_DRAIN_INTERVAL: float = 5.0
+
+    # Публикация событий заказов из order_outbox
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_POLL_INTERVAL: float = 5.0
+
+    # Начиная с этого числа строк (по статистике) админка не считает COUNT(*)
+    ADMIN_COUNT_ESTIMATE_THRESHOLD: int = 100000
+
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE: int = 32
+
+    PRINCIPAL_CACHE_TTL: int = 60
+    PRINCIPAL_CACHE_SIZE: int = 100_000
+
+    # Резерв товара в корзине (секунды) и очистка просроченных резервов
+    RESERVATION_TTL: int = 900
+    RESERVATION_SWEEP_INTERVAL: float = 60.0
+    RESERVATION_SWEEP_BATCH: int = 1000
+
+    REDIS_URL: str = "redis://localhost:6379"
+
+    CACHE_L1_MAX_ENTRIES: int = 10_000
+    CACHE_L1_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_L1_TTL: int = 60
+    CACHE_PRODUCT_TTL: int = 3600
+    CACHE_STALE_TTL: int = 300
+    # Счетчики товаров в дереве категорий обновляются не чаще этого
+    CACHE_CATEGORY_TREE_TTL: int = 60
+    CACHE_DISTRIBUTED_LOCK: bool = True
+    CACHE_LOCK_TIMEOUT: float = 5.0
+    CACHE_LOCK_WAIT: float = 2.0
+
+    # Порт HTTP-экспорта метрик Celery-воркера (0 — отключено)
+    CELERY_METRICS_PORT: int = 9101
 
     model_config = SettingsConfigDict(env_file="../.env")
 
@@ -1,53 +1,202 @@
-from sqlalchemy import select, insert, delete, update
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import (
+    Integer,
+    Select,
+    any_,
+    bindparam,
+    select,
+    insert,
+    delete,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.base_db import session_scope
+from app.exception.base_exceptions import DataBaseError, InvalidFilterError
+from app.metrics import DAO_STATEMENT_CACHE, instrument_dao
 
-from app.database.base_db import session_factory
-from app.exception.base_exceptions import DataBaseError
+# Готовые SELECT по (таблица, ключи фильтра): значения передаются через
+# bindparam, поэтому объект запроса и его ключ кэша компиляции переиспользуются
+_select_statements: dict[tuple, Select] = {}
 
 
 class BaseDAO:
     model = None
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Метрики числа вызовов, запросов и длительности для методов наследника
+        instrument_dao(cls)
+
     @classmethod
-    async def find_one_or_none(cls, **filter_by):
-        async with session_factory() as session:
-            query = select(cls.model.__table__.columns).filter_by(**filter_by)
-            result = await session.execute(query)
+    def select_by(cls, filter_by: dict) -> tuple[Select, dict]:
+        """
+        Возвращает закэшированный SELECT ... WHERE column = :column для набора
+        ключей фильтра и параметры к нему. None сравнивается через IS NULL,
+        неизвестное поле дает InvalidFilterError.
+        """
+        table = cls.model.__table__
+        unknown = sorted(set(filter_by) - set(table.c.keys()))
+        if unknown:
+            raise InvalidFilterError(
+                f"{table.name}: неизвестные поля фильтра {', '.join(unknown)}"
+            )
+        filters = tuple(
+            sorted((name, value is None) for name, value in filter_by.items())
+        )
+        query = _select_statements.get((table, filters))
+        if query is None:
+            DAO_STATEMENT_CACHE.labels("miss").inc()
+            query = select(table.columns).where(
+                *(
+                    (
+                        table.c[name].is_(None)
+                        if is_none
+                        else table.c[name] == bindparam(name)
+                    )
+                    for name, is_none in filters
+                )
+            )
+            _select_statements[(table, filters)] = query
+        else:
+            DAO_STATEMENT_CACHE.labels("hit").inc()
+        params = {name: value for name, value in filter_by.items() if value is not None}
+        return query, params
+
+    @classmethod
+    async def find_one_or_none(
+        cls, session: Optional[AsyncSession] = None, **filter_by
+    ):
+        async with session_scope(session) as session:
+            query, params = cls.select_by(filter_by)
+            result = await session.execute(query, params)
             return result.mappings().one_or_none()
 
     @classmethod
-    async def find_all(cls, **filter_by):
-        async with session_factory() as session:
-            query = select(cls.model.__table__.columns).filter_by(**filter_by)
+    async def find_all(cls, session: Optional[AsyncSession] = None, **filter_by):
+        async with session_scope(session) as session:
+            query, params = cls.select_by(filter_by)
+            result = await session.execute(query, params)
+            return result.mappings().all()
+
+    @classmethod
+    async def find_many(
+        cls, ids: Iterable[int], session: Optional[AsyncSession] = None
+    ):
+        """
+        Возвращает строки по списку идентификаторов одним запросом
+        WHERE id = ANY(:ids).
+        """
+        query = select(cls.model.__table__.columns).where(
+            cls.model.id == any_(bindparam("ids", list(ids), type_=ARRAY(Integer)))
+        )
+        async with session_scope(session) as session:
             result = await session.execute(query)
             return result.mappings().all()
 
     @classmethod
-    async def add(cls, **data):
+    async def add(cls, session: Optional[AsyncSession] = None, **data):
         query = insert(cls.model).values(**data).returning(cls.model.id)
-        async with session_factory() as session:
+        async with session_scope(session) as session:
             result = await session.execute(query)
-            await session.commit()
             return result.mappings().first()
 
     @classmethod
-    async def update(cls, id, **data):
+    async def update(cls, id, session: Optional[AsyncSession] = None, **data):
         query = (
             update(cls.model).values(**data).filter_by(id=id).returning(cls.model.id)
         )
-        async with session_factory() as session:
+        async with session_scope(session) as session:
             result = await session.execute(query)
-            await session.commit()
             return result.mappings().first()
 
     @classmethod
-    async def delete(cls, **filter_by):
-        async with session_factory() as session:
+    async def delete(cls, session: Optional[AsyncSession] = None, **filter_by):
+        async with session_scope(session) as session:
             query = delete(cls.model).filter_by(**filter_by)
             await session.execute(query)
-            await session.commit()
+
+    @classmethod
+    async def add_many(
+        cls, rows: Sequence[dict], session: Optional[AsyncSession] = None
+    ):
+        """
+        Добавляет несколько строк одним INSERT ... VALUES (...), (...) RETURNING id.
+        """
+        if not rows:
+            return []
+        query = insert(cls.model).values(list(rows)).returning(cls.model.id)
+        async with session_scope(session) as session:
+            result = await session.execute(query)
+            return result.mappings().all()
+
+    @classmethod
+    async def update_many(
+        cls,
+        items: Iterable[tuple[int, dict]],
+        session: Optional[AsyncSession] = None,
+    ):
+        """
+        Обновляет несколько строк по первичному ключу пакетом (executemany).
+        Принимает пары (id, значения).
+        """
+        params = [{"id": id, **data} for id, data in items]
+        if not params:
+            return
+        async with session_scope(session) as session:
+            await session.execute(update(cls.model), params)
+
+    @classmethod
+    async def upsert_many(
+        cls,
+        rows: Sequence[dict],
+        index_elements: Sequence[str] = ("id",),
+        update_columns: Optional[Sequence[str]] = None,
+        session: Optional[AsyncSession] = None,
+    ):
+        """
+        Вставляет или обновляет строки одним INSERT ... ON CONFLICT DO UPDATE.
+        По умолчанию обновляются все переданные колонки, кроме ключа конфликта.
+        """
+        if not rows:
+            return []
+        query = pg_insert(cls.model).values(list(rows))
+        if update_columns is None:
+            update_columns = [
+                key for key in rows[0].keys() if key not in index_elements
+            ]
+        if update_columns:
+            query = query.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={key: query.excluded[key] for key in update_columns},
+            )
+        else:
+            query = query.on_conflict_do_nothing(index_elements=index_elements)
+        query = query.returning(cls.model.id)
+        async with session_scope(session) as session:
+            result = await session.execute(query)
+            return result.mappings().all()
+
+    @classmethod
+    async def delete_many(
+        cls, ids: Iterable[int], session: Optional[AsyncSession] = None
+    ):
+        """
+        Удаляет строки по списку идентификаторов одним запросом.
+        """
+        query = delete(cls.model).where(
+            cls.model.id == any_(bindparam("ids", list(ids), type_=ARRAY(Integer)))
+        )
+        async with session_scope(session) as session:
+            await session.execute(query)
 
     # @classmethod
     # async def update(cls, **data):
     #     query = update(cls.model).where()
     #     async with session_factory() as session:
+
+
+instrument_dao(BaseDAO)
@@ -1,10 +1,192 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import time
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import NullPool
 from sqlalchemy.orm import DeclarativeBase, declared_attr, Mapped, mapped_column
 
 from app.config import settings
+from app.metrics import (
+    DB_POOL_CHECKOUT_WAIT,
+    DB_REPLICA_LAG,
+    DB_SESSIONS,
+    instrument_engine,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def make_engine(url: str) -> AsyncEngine:
+    """
+    Создает движок с настройками пула и asyncpg из Settings.
+    Суммарно воркеры держат до workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    соединений — это число должно быть меньше max_connections сервера.
+    """
+    connect_args = {}
+    # PgBouncer отклоняет незнакомые параметры запуска соединения, поэтому
+    # с ним DB_STATEMENT_TIMEOUT не передается: таймаут задается на роли
+    # (ALTER ROLE ... SET statement_timeout)
+    if settings.DB_STATEMENT_TIMEOUT and not settings.DB_PGBOUNCER:
+        connect_args["server_settings"] = {
+            "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT)
+        }
+
+    if settings.DB_PGBOUNCER:
+        # Пулом управляет PgBouncer: подготовленные выражения не переживают
+        # смену серверного соединения, поэтому кэши отключены, а имена
+        # выражений уникальны
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: (
+            f"__asyncpg_{uuid.uuid4()}__"
+        )
+        return create_async_engine(url, poolclass=NullPool, connect_args=connect_args)
+
+    connect_args["prepared_statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+    return create_async_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args=connect_args,
+    )
 
-engine = create_async_engine(settings.DB_URL)
+
+engine = make_engine(settings.DB_URL)
 session_factory = async_sessionmaker(engine)
+instrument_engine(engine)
+
+replica_engine = (
+    make_engine(settings.DB_REPLICA_URL) if settings.DB_REPLICA_URL else None
+)
+replica_session_factory = (
+    async_sessionmaker(replica_engine) if replica_engine is not None else None
+)
+if replica_engine is not None:
+    instrument_engine(replica_engine)
+
+# Запрос уже работал с primary: последующие чтения тоже идут туда,
+# чтобы видеть собственные записи
+primary_pinned: ContextVar[bool] = ContextVar("primary_pinned", default=False)
+
+# Результат последней проверки отставания реплики: (время проверки, годна ли)
+_replica_state = {"checked_at": 0.0, "healthy": False}
+
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery()
+          OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+async def replica_available() -> bool:
+    """
+    Проверяет отставание реплики не чаще раза в DB_REPLICA_LAG_CHECK_INTERVAL;
+    при ошибке или отставании больше DB_REPLICA_MAX_LAG реплика не используется.
+    """
+    now = time.monotonic()
+    if now - _replica_state["checked_at"] < settings.DB_REPLICA_LAG_CHECK_INTERVAL:
+        return _replica_state["healthy"]
+    _replica_state["checked_at"] = now
+
+    try:
+        async with replica_engine.connect() as connection:
+            lag = float((await connection.execute(REPLICA_LAG_QUERY)).scalar() or 0)
+    except (SQLAlchemyError, OSError):
+        logger.warning("Read replica is unavailable", exc_info=True)
+        _replica_state["healthy"] = False
+    else:
+        DB_REPLICA_LAG.set(lag)
+        _replica_state["healthy"] = lag <= settings.DB_REPLICA_MAX_LAG
+    return _replica_state["healthy"]
+
+
+@asynccontextmanager
+async def session_scope(
+    session: Optional[AsyncSession] = None, read_only: bool = False
+) -> AsyncIterator[AsyncSession]:
+    """
+    Возвращает переданную сессию единицы работы без фиксации изменений,
+    либо открывает новую транзакцию, которая фиксируется при выходе из блока.
+    С read_only=True запрос уходит на реплику, если она настроена, не отстает
+    и в текущем запросе еще не было обращений к primary.
+    """
+    if session is not None:
+        yield session
+    elif (
+        read_only
+        and replica_session_factory is not None
+        and not primary_pinned.get()
+        and await replica_available()
+    ):
+        DB_SESSIONS.labels("replica").inc()
+        async with replica_session_factory() as new_session:
+            await acquire_connection(new_session)
+            yield new_session
+    else:
+        DB_SESSIONS.labels("primary").inc()
+        if not read_only:
+            primary_pinned.set(True)
+        async with session_factory.begin() as new_session:
+            await acquire_connection(new_session)
+            yield new_session
+        await run_after_commit(new_session)
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """
+    Зависимость FastAPI: одна сессия (и одно соединение из пула) на запрос.
+    Изменения фиксируются один раз после успешного выполнения обработчика,
+    при исключении транзакция откатывается.
+    """
+    DB_SESSIONS.labels("primary").inc()
+    primary_pinned.set(True)
+    async with session_factory() as session:
+        await acquire_connection(session)
+        yield session
+        await session.commit()
+        await run_after_commit(session)
+
+
+async def acquire_connection(session: AsyncSession) -> None:
+    """
+    Сразу берет соединение из пула для сессии, замеряя время ожидания.
+    """
+    start = time.perf_counter()
+    await session.connection()
+    DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+def after_commit(
+    session: AsyncSession, callback: Callable[[], Awaitable[None]]
+) -> None:
+    """
+    Откладывает асинхронное действие (например, очистку кэша) до фиксации
+    транзакции сессии, открытой session_scope или get_session.
+    """
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+async def run_after_commit(session: AsyncSession) -> None:
+    for callback in session.info.pop("after_commit", []):
+        await callback()
 
 
 class Base(DeclarativeBase):
@@ -1,7 +1,18 @@
-__all__ = ("User", "Product", "Basket", "BasketItem", "Category", "Order", "OrderItem")
+__all__ = (
+    "User",
+    "Product",
+    "Basket",
+    "BasketItem",
+    "Reservation",
+    "Category",
+    "CategoryPath",
+    "Order",
+    "OrderItem",
+    "OrderOutbox",
+)
 
-from app.database.models.basket_model import Basket, BasketItem
-from app.database.models.category_model import Category
-from app.database.models.order_model import Order, OrderItem
+from app.database.models.basket_model import Basket, BasketItem, Reservation
+from app.database.models.category_model import Category, CategoryPath
+from app.database.models.order_model import Order, OrderItem, OrderOutbox
 from app.database.models.product_model import Product
 from app.database.models.user_model import User
@@ -1,6 +1,7 @@
+from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, Numeric, UniqueConstraint
+from sqlalchemy import DateTime, ForeignKey, Numeric, UniqueConstraint
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.types import DECIMAL
 
@@ -13,7 +14,9 @@ if TYPE_CHECKING:
 
 class Basket(Base):
 
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id"), unique=True, index=True
+    )
 
     user: Mapped["User"] = relationship(back_populates="basket")
     items: Mapped[list["BasketItem"]] = relationship(
@@ -41,3 +44,22 @@ class BasketItem(Base):
 
     def __str__(self):
         return f"Продукт: #{self.product_id}"
+
+
+class Reservation(Base):
+
+    basket_id: Mapped[int] = mapped_column(ForeignKey("baskets.id"))
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("products.id", ondelete="CASCADE")
+    )
+    quantity: Mapped[int]
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "basket_id", "product_id", name="uq_reservations_basket_product"
+        ),
+    )
+
+    def __str__(self):
+        return f"Резерв: #{self.product_id} x {self.quantity}"
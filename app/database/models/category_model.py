@@ -1,6 +1,6 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import String
+from sqlalchemy import ForeignKey, String, UniqueConstraint
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
 from app.database.base_db import Base
@@ -12,6 +12,13 @@ if TYPE_CHECKING:
 class Category(Base):
 
     name: Mapped[str] = mapped_column(String(60))
+    parent_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("categorys.id", ondelete="SET NULL"), index=True
+    )
+    # Товары самой категории (без подкатегорий); счетчики ведут триггеры
+    # на products из миграции add_category_tree
+    product_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    in_stock_count: Mapped[int] = mapped_column(default=0, server_default="0")
 
     product: Mapped["Product"] = relationship(
         back_populates="category", cascade="all, delete-orphan"
@@ -19,3 +26,25 @@ class Category(Base):
 
     def __str__(self):
         return f"{self.name}"
+
+
+class CategoryPath(Base):
+    """
+    Таблица замыкания дерева категорий: строка на каждую пару «предок —
+    потомок», включая саму категорию (depth = 0). Ведется триггерами
+    на categorys.
+    """
+
+    ancestor_id: Mapped[int] = mapped_column(
+        ForeignKey("categorys.id", ondelete="CASCADE")
+    )
+    descendant_id: Mapped[int] = mapped_column(
+        ForeignKey("categorys.id", ondelete="CASCADE"), index=True
+    )
+    depth: Mapped[int]
+
+    __table_args__ = (
+        UniqueConstraint(
+            "ancestor_id", "descendant_id", name="uq_categorypaths_ancestor_descendant"
+        ),
+    )
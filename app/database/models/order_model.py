@@ -1,7 +1,18 @@
+from datetime import datetime
 from enum import Enum
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, Numeric, String, Enum as SQLEnum, UniqueConstraint
+from sqlalchemy import (
+    DateTime,
+    ForeignKey,
+    Index,
+    Numeric,
+    String,
+    Enum as SQLEnum,
+    UniqueConstraint,
+    func,
+)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.types import DECIMAL
 
@@ -33,11 +44,15 @@ class Order(Base):
         return f"Заказ: #{self.id}"
 
 
+# История заказов пользователя читается от новых к старым
+Index("ix_orders_user_id_id", Order.user_id, Order.id.desc())
+
+
 class OrderItem(Base):
 
     basket_id: Mapped[int] = mapped_column(ForeignKey("baskets.id"))
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
-    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"))
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), index=True)
     quantity: Mapped[int] = mapped_column(nullable=False, default=1)
     price: Mapped[DECIMAL] = mapped_column(Numeric(10, 2))
 
@@ -47,3 +62,23 @@ class OrderItem(Base):
 
     def __str__(self):
         return f"Продукт: #{self.product_id}"
+
+
+class OrderOutbox(Base):
+    """
+    События заказов, записанные в одной транзакции с заказом. Отдельный
+    процесс (app.order.outbox_relay) публикует и удаляет их.
+    """
+
+    __tablename__ = "order_outbox"
+
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"))
+    event: Mapped[str] = mapped_column(String(60))
+    payload: Mapped[dict] = mapped_column(JSONB)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+    __table_args__ = (
+        UniqueConstraint("order_id", "event", name="uq_order_outbox_order_event"),
+    )
@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import String, Numeric, ForeignKey
+from sqlalchemy import String, Numeric, ForeignKey, Index
 from sqlalchemy.types import DECIMAL
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
@@ -16,11 +16,22 @@ class Product(Base):
     description: Mapped[str] = mapped_column(String(255))
     price: Mapped[DECIMAL] = mapped_column(Numeric(10, 2))
     quantity: Mapped[int]
+    # Сколько из quantity зарезервировано корзинами; доступно quantity - reserved
+    reserved: Mapped[int] = mapped_column(default=0, server_default="0")
     category_id: Mapped[int] = mapped_column(ForeignKey("categorys.id"), nullable=False)
 
     category: Mapped["Category"] = relationship(back_populates="product")
     items: Mapped["BasketItem"] = relationship(back_populates="product")
     order_items: Mapped["OrderItem"] = relationship(back_populates="product")
 
+    __table_args__ = (
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_name_id", "name", "id"),
+        # Страницы категории; (category_id, id) заменяет индекс по category_id
+        Index("ix_products_category_id_id", "category_id", "id"),
+        Index("ix_products_category_id_price_id", "category_id", "price", "id"),
+        Index("ix_products_category_id_name_id", "category_id", "name", "id"),
+    )
+
     def __str__(self):
         return f"{self.name}"
@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy.orm import relationship, Mapped
+from sqlalchemy.orm import relationship, Mapped, mapped_column
 
 from app.database.base_db import Base
 
@@ -10,7 +10,7 @@ if TYPE_CHECKING:
 
 class User(Base):
 
-    email: Mapped[str]
+    email: Mapped[str] = mapped_column(unique=True, index=True)
     hash_password: Mapped[str]
 
     basket: Mapped["Basket"] = relationship(back_populates="user")
@@ -0,0 +1,68 @@
+import base64
+import json
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import Select, literal, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.exception.base_exceptions import InvalidCursorError
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Упаковывает значения ключа сортировки последней строки страницы
+    в непрозрачный курсор.
+    """
+    raw = json.dumps([str(value) for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, columns: Sequence[ColumnElement]) -> tuple:
+    """
+    Распаковывает курсор и приводит значения к типам колонок ключа сортировки.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return tuple(
+            column.type.python_type(value)
+            for column, value in zip(columns, values, strict=True)
+        )
+    except (ValueError, TypeError, ArithmeticError):
+        raise InvalidCursorError
+
+
+def paginate_keyset(
+    query: Select,
+    columns: Sequence[ColumnElement],
+    after: Optional[str],
+    limit: int,
+    descending: bool = False,
+) -> Select:
+    """
+    Добавляет к запросу сортировку по ключу (последняя колонка - уникальный
+    тайбрейкер), условие «строго после курсора» и LIMIT limit + 1, чтобы
+    узнать, есть ли следующая страница, без отдельного COUNT.
+    """
+    if after:
+        values = decode_cursor(after, columns)
+        key = tuple_(*columns)
+        bound = tuple_(
+            *(literal(value, column.type) for column, value in zip(columns, values))
+        )
+        query = query.where(key < bound if descending else key > bound)
+
+    order_by = [column.desc() if descending else column.asc() for column in columns]
+    return query.order_by(*order_by).limit(limit + 1)
+
+
+def build_page(rows: Sequence, columns: Sequence[ColumnElement], limit: int) -> dict:
+    """
+    Формирует страницу из limit + 1 строк: элементы, флаг has_more
+    и курсор следующей страницы.
+    """
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor([items[-1][column.key] for column in columns])
+    return {"items": items, "next_cursor": next_cursor, "has_more": has_more}
@@ -0,0 +1,114 @@
+"""
+Нагрузочная проверка пула соединений.
+
+Запускает несколько процессов (как воркеры uvicorn), в каждом — заданное
+число одновременных «запросов», которые берут соединение из пула и держат
+его hold секунд. Печатает время ожидания соединения и число таймаутов пула;
+код возврата 1, если были таймауты.
+
+    python -m app.database.pool_stress --processes 4 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.config import settings
+
+
+async def run_load(concurrency: int, requests: int, hold: float) -> dict:
+    from app.database.base_db import engine, session_factory
+
+    waits = []
+    timeouts = 0
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def client():
+        nonlocal timeouts
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                async with session_factory() as session:
+                    await session.connection()
+                    waits.append(time.perf_counter() - start)
+                    await session.execute(
+                        text("SELECT pg_sleep(:hold)"), {"hold": hold}
+                    )
+            except PoolTimeoutError:
+                timeouts += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    return {"waits": waits, "timeouts": timeouts, "elapsed": elapsed}
+
+
+def run_process(concurrency: int, requests: int, hold: float) -> dict:
+    return asyncio.run(run_load(concurrency, requests, hold))
+
+
+async def max_connections() -> int:
+    from app.database.base_db import engine
+
+    async with engine.connect() as connection:
+        value = (await connection.execute(text("SHOW max_connections"))).scalar()
+    await engine.dispose()
+    return int(value)
+
+
+def main(processes: int, concurrency: int, requests: int, hold: float) -> int:
+    per_process = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    print(
+        f"pool_size={settings.DB_POOL_SIZE} max_overflow={settings.DB_MAX_OVERFLOW} "
+        f"pool_timeout={settings.DB_POOL_TIMEOUT}s pgbouncer={settings.DB_PGBOUNCER}"
+    )
+    print(
+        f"{processes} processes x {per_process} connections = "
+        f"{processes * per_process}, server max_connections = "
+        f"{asyncio.run(max_connections())}"
+    )
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(processes, mp_context=context) as executor:
+        results = list(
+            executor.map(
+                run_process,
+                [concurrency] * processes,
+                [requests] * processes,
+                [hold] * processes,
+            )
+        )
+
+    waits = sorted(wait for result in results for wait in result["waits"])
+    timeouts = sum(result["timeouts"] for result in results)
+    elapsed = max(result["elapsed"] for result in results)
+    if waits:
+        p95 = waits[int(len(waits) * 0.95) - 1] if len(waits) > 1 else waits[0]
+        print(
+            f"checkouts={len(waits)} throughput={len(waits) / elapsed:.1f}/s "
+            f"wait p50={statistics.median(waits) * 1000:.1f}ms "
+            f"p95={p95 * 1000:.1f}ms max={waits[-1] * 1000:.1f}ms"
+        )
+    print(f"pool timeouts={timeouts}")
+    return 1 if timeouts else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--hold", type=float, default=0.05)
+    args = parser.parse_args()
+    sys.exit(main(args.processes, args.concurrency, args.requests, args.hold))
@@ -0,0 +1,187 @@
+"""
+Проверка планов запросов DAO.
+
+Заполняет локальную базу PostgreSQL (в транзакции, которая затем
+откатывается), выполняет типичные обращения DAO, перехватывает
+отправленные в базу запросы и выполняет для каждого EXPLAIN. Завершается
+с ошибкой, если в плане есть последовательное сканирование таблицы,
+в которой строк больше порога.
+
+    python -m app.database.query_plans --rows 100000 --threshold 1000
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.basket.dao import BasketDAO, BasketItemDAO, ReservationDAO
+from app.category.dao import CategoryDAO
+from app.database.base_db import engine
+from app.database.models.order_model import PaymentType
+from app.order.dao import OrderDAO
+from app.product.dao import ProductDAO
+from app.product.schemas import ProductSort
+from app.user.dao import UserDAO
+
+SEED = [
+    """
+    INSERT INTO categorys (name)
+    SELECT 'category ' || g FROM generate_series(1, :categories) g
+    """,
+    """
+    INSERT INTO users (email, hash_password)
+    SELECT 'user' || g || '@example.com', 'x' FROM generate_series(1, :rows) g
+    ON CONFLICT (email) DO NOTHING
+    """,
+    "INSERT INTO baskets (user_id) SELECT id FROM users ON CONFLICT DO NOTHING",
+    """
+    WITH c AS (SELECT max(id) AS last FROM categorys)
+    INSERT INTO products (name, description, price, quantity, category_id)
+    SELECT 'product ' || g, 'description ' || g, g % 1000 + 0.99, 100,
+           c.last - g % :categories
+    FROM generate_series(1, :rows) g, c
+    """,
+    """
+    INSERT INTO basketitems (basket_id, product_id, quantity, price)
+    SELECT b.id, p.id, 1, p.price
+    FROM (SELECT id FROM baskets ORDER BY id LIMIT 1000) b
+    CROSS JOIN (SELECT id, price FROM products ORDER BY id LIMIT 3) p
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO orders (user_id, total_price, status, payment_method)
+    SELECT id, 100, 'completed', 'Card' FROM users
+    """,
+    # Без статистики по только что заполненным таблицам планировщик может
+    # выбрать вложенный цикл для соединения orders и baskets
+    "ANALYZE users, baskets, products, orders",
+    """
+    INSERT INTO orderitems (basket_id, product_id, order_id, quantity, price)
+    SELECT b.id, (SELECT max(id) FROM products) - o.id % :rows, o.id, 1, 1
+    FROM orders o JOIN baskets b ON b.user_id = o.user_id
+    """,
+    "ANALYZE",
+]
+
+
+async def run_dao_calls(session: AsyncSession) -> None:
+    """
+    Обращения DAO, планы которых проверяются.
+    """
+    user = await UserDAO.find_one_or_none(session, email="user500@example.com")
+    await UserDAO.find_principal(user.id, session)
+    basket = await BasketDAO.find_one_or_none(session, user_id=user.id)
+    for sort in ProductSort:
+        page = await ProductDAO.find_products_page(20, None, sort, session)
+        await ProductDAO.find_products_page(20, page["next_cursor"], sort, session)
+
+    product = await ProductDAO.find_one_or_none(session, id=page["items"][0]["id"])
+    for sort in ProductSort:
+        page = await ProductDAO.find_category_page(
+            product.category_id, 20, None, sort, None, session
+        )
+        await ProductDAO.find_category_page(
+            product.category_id, 20, page["next_cursor"], sort, None, session
+        )
+    await CategoryDAO.tree(session)
+    await CategoryDAO.path(product.category_id, session)
+    await ProductDAO.find_many([product.id, product.id + 1], session)
+    hits = await ProductDAO.search("12345 product", 20, None, session=session)
+    await ProductDAO.search("12345 product", 20, hits["next_cursor"], session=session)
+    await ProductDAO.search_facets("12345 product", session=session)
+
+    await BasketItemDAO.find_lines_with_product_name(user.id, session)
+    await BasketItemDAO.find_one_or_none(
+        session, basket_id=basket.id, product_id=product.id
+    )
+    await BasketItemDAO.add_or_increase(user.id, product.id, 2, session)
+    await ReservationDAO.release(basket.id, product.id, 1, session)
+    await ProductDAO.update(product.id, session, quantity=product.quantity)
+
+    order = await OrderDAO.checkout(user.id, PaymentType.Card, session)
+    await OrderDAO.find_one_or_none(session, id=order["id"])
+    history = await OrderDAO.find_history(user.id, 1, None, session)
+    await OrderDAO.find_history(user.id, 1, history["next_cursor"], session)
+    await ReservationDAO.release_expired(100, session)
+
+
+def find_seq_scans(plan: dict, sizes: dict, threshold: int) -> list[str]:
+    problems = []
+    if plan["Node Type"] == "Seq Scan":
+        table = plan["Relation Name"]
+        if sizes.get(table, 0) > threshold:
+            problems.append(f"Seq Scan on {table} ({sizes[table]} rows)")
+    for child in plan.get("Plans", []):
+        problems.extend(find_seq_scans(child, sizes, threshold))
+    return problems
+
+
+async def main(rows: int, categories: int, threshold: int) -> int:
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    failures = 0
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        try:
+            for query in SEED:
+                await connection.execute(
+                    text(query), {"rows": rows, "categories": categories}
+                )
+
+            event.listen(engine.sync_engine, "before_cursor_execute", capture)
+            try:
+                await run_dao_calls(AsyncSession(bind=connection))
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+            sizes = dict(
+                (
+                    await connection.execute(
+                        text(
+                            "SELECT relname, reltuples::bigint FROM pg_class "
+                            "WHERE relkind = 'r'"
+                        )
+                    )
+                ).all()
+            )
+
+            for statement, parameters in statements:
+                if (
+                    not statement.lstrip()
+                    .upper()
+                    .startswith(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"))
+                ):
+                    continue
+                result = await connection.exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {statement}", parameters
+                )
+                plan = result.scalar()
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                problems = find_seq_scans(plan[0]["Plan"], sizes, threshold)
+                status = "FAIL" if problems else "ok"
+                print(f"[{status}] {' '.join(statement.split())[:120]}")
+                for problem in problems:
+                    print(f"       {problem}")
+                failures += bool(problems)
+        finally:
+            await transaction.rollback()
+
+    print(f"{len(statements)} statements checked, {failures} with seq scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--categories", type=int, default=100)
+    parser.add_argument("--threshold", type=int, default=1_000)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.rows, args.categories, args.threshold)))
@@ -10,3 +10,15 @@ class DataBaseError(CustomError):
     """Ошибка для случаев, связанных с базой данных."""
 
     pass
+
+
+class InvalidCursorError(CustomError):
+    """Ошибка для случая, когда курсор пагинации поврежден или не подходит."""
+
+    pass
+
+
+class InvalidFilterError(CustomError):
+    """Ошибка для случая, когда фильтр ссылается на несуществующий столбец."""
+
+    pass
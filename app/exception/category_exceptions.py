@@ -0,0 +1,13 @@
+from app.exception.base_exceptions import CustomError
+
+
+class CategoryNotFoundError(CustomError):
+    """Ошибка для случая, когда категория (или ее родитель) не найдена."""
+
+    pass
+
+
+class CategoryCycleError(CustomError):
+    """Ошибка для случая, когда категорию переносят в ее же поддерево."""
+
+    pass
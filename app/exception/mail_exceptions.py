@@ -0,0 +1,7 @@
+from app.exception.base_exceptions import CustomError
+
+
+class MailServerUnavailableError(CustomError):
+    """Ошибка для случая, когда к SMTP-серверу не удалось подключиться или войти."""
+
+    pass
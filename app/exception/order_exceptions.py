@@ -0,0 +1,13 @@
+from app.exception.base_exceptions import CustomError
+
+
+class EmptyBasketError(CustomError):
+    """Ошибка для случая, когда корзина пуста."""
+
+    pass
+
+
+class NotEnoughProductError(CustomError):
+    """Ошибка для случая, когда товара на складе недостаточно."""
+
+    pass
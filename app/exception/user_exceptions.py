@@ -17,3 +17,9 @@ class TokenNotFound(CustomError):
     """Ошибка для случая, когда токен не найден."""
 
     pass
+
+
+class PasswordServiceBusy(CustomError):
+    """Ошибка для случая, когда очередь хеширования паролей переполнена."""
+
+    pass
@@ -1,9 +1,10 @@
+import asyncio
+
 import uvicorn
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 
 from redis import asyncio as aioredis
 from sqladmin import Admin
@@ -18,21 +19,38 @@ from app.admin.views import (
     OrderItemsAdmin,
 )
 from app.basket.router import router_basket
+from app.cache.backend import TwoTierBackend
+from app.category.router import router_category
+from app.config import settings
 from app.database.base_db import engine
+from app.metrics import http_metrics_middleware, router_metrics
 from app.order.router import route_buy
 from app.product.router import router_product
+from app.user.dependencies import PRINCIPAL_CACHE, principal_cache
 from app.user.router import router_auth, router_user
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    redis = aioredis.from_url("redis://localhost:6379")
-    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    redis = aioredis.from_url(settings.REDIS_URL)
+    backend = TwoTierBackend(
+        redis,
+        max_entries=settings.CACHE_L1_MAX_ENTRIES,
+        max_bytes=settings.CACHE_L1_MAX_BYTES,
+        ttl=settings.CACHE_L1_TTL,
+    )
+    backend.register_local(PRINCIPAL_CACHE, principal_cache)
+    FastAPICache.init(backend, prefix="fastapi-cache")
+
+    # Слушаем инвалидации кэша от других воркеров
+    invalidation_listener = asyncio.create_task(backend.listen_invalidations())
     yield
     # shutdown
+    invalidation_listener.cancel()
 
 
 main_app = FastAPI(lifespan=lifespan)
+main_app.middleware("http")(http_metrics_middleware)
 
 admin = Admin(main_app, engine=engine, authentication_backend=authentication_backend)
 admin.add_view(UserAdmin)
@@ -46,8 +64,10 @@ admin.add_view(OrderItemsAdmin)
 main_app.include_router(router_auth)
 main_app.include_router(router_user)
 main_app.include_router(router_product)
+main_app.include_router(router_category)
 main_app.include_router(router_basket)
 main_app.include_router(route_buy)
+main_app.include_router(router_metrics)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,215 @@
+import os
+import time
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from fastapi import APIRouter, Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+DAO_CALL_DURATION = Histogram(
+    "dao_call_duration_seconds",
+    "DAO method latency (the _count series is the number of calls)",
+    ["dao", "method"],
+)
+DB_STATEMENTS = Counter(
+    "db_statements_total",
+    "SQL statements sent to the database by DAO method",
+    ["dao", "method"],
+)
+DAO_STATEMENT_CACHE = Counter(
+    "dao_statement_cache_total",
+    "Lookups in the BaseDAO prebuilt statement cache (hit, miss)",
+    ["result"],
+)
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds",
+    "SQL statement execution time by operation",
+    ["operation"],
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Pooled database connections by state",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds",
+    "Last measured replication lag of the read replica",
+    multiprocess_mode="max",
+)
+DB_SESSIONS = Counter(
+    "db_sessions_total", "Sessions opened by target database", ["target"]
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by namespace and result (hit, stale, miss)",
+    ["namespace", "result"],
+)
+CELERY_QUEUE_LATENCY = Histogram(
+    "celery_task_queue_latency_seconds",
+    "Time between publishing a task and a worker starting it",
+    ["task"],
+)
+CELERY_TASK_FAILURES = Counter(
+    "celery_task_failures_total", "Failed Celery tasks", ["task"]
+)
+
+# DAO-метод, выполняющийся в текущем контексте (для подсчета SQL-запросов)
+current_dao_method: ContextVar[tuple[str, str]] = ContextVar(
+    "current_dao_method", default=("", "")
+)
+
+
+def registry() -> CollectorRegistry:
+    """
+    Реестр для экспорта. При нескольких процессах (uvicorn --workers, prefork
+    в Celery) метрики собираются из PROMETHEUS_MULTIPROC_DIR.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+def observe_dao(func):
+    @wraps(func)
+    async def wrapper(cls, *args, **kwargs):
+        token = current_dao_method.set((cls.__name__, func.__name__))
+        start = time.perf_counter()
+        try:
+            return await func(cls, *args, **kwargs)
+        finally:
+            DAO_CALL_DURATION.labels(cls.__name__, func.__name__).observe(
+                time.perf_counter() - start
+            )
+            current_dao_method.reset(token)
+
+    return wrapper
+
+
+def instrument_dao(cls) -> None:
+    """
+    Оборачивает публичные асинхронные classmethod'ы DAO-класса метриками.
+    """
+    for name, attr in list(vars(cls).items()):
+        if (
+            isinstance(attr, classmethod)
+            and iscoroutinefunction(attr.__func__)
+            and not name.startswith("_")
+        ):
+            setattr(cls, name, classmethod(observe_dao(attr.__func__)))
+
+
+# Ключ в ConnectionRecord.info: соединение выдано из пула и учтено в метрике
+_CHECKED_OUT = "metrics_checked_out"
+
+
+def instrument_engine(engine) -> None:
+    """
+    Подписывается на события движка и пула SQLAlchemy.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        # Время храним в контексте выполнения: при ошибке запроса он просто
+        # освобождается, а не копится в стеке соединения
+        context.query_start = time.perf_counter()
+        DB_STATEMENTS.labels(*current_dao_method.get()).inc()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        start = context.query_start
+        operation = statement.lstrip().split(" ", 1)[0].upper()
+        DB_STATEMENT_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+    @event.listens_for(sync_engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS.labels("open").inc()
+
+    @event.listens_for(sync_engine, "close")
+    def close(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS.labels("open").dec()
+
+    # Отметка в info записи пула делает уменьшение однократным, сколько бы
+    # событий ни пришло на одну выдачу соединения (checkin после invalidate,
+    # detach без checkin)
+    @event.listens_for(sync_engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info[_CHECKED_OUT] = True
+        DB_POOL_CONNECTIONS.labels("checked_out").inc()
+
+    @event.listens_for(sync_engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        if connection_record.info.pop(_CHECKED_OUT, False):
+            DB_POOL_CONNECTIONS.labels("checked_out").dec()
+
+    @event.listens_for(sync_engine, "detach")
+    def detach(dbapi_connection, connection_record):
+        # Отсоединенное соединение покидает пул без checkin, а закрывается
+        # событием close_detached, а не close
+        DB_POOL_CONNECTIONS.labels("open").dec()
+        if connection_record.info.pop(_CHECKED_OUT, False):
+            DB_POOL_CONNECTIONS.labels("checked_out").dec()
+
+
+async def http_metrics_middleware(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Шаблон пути вместо фактического URL, чтобы не плодить серии
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.labels(
+            request.method, getattr(route, "path", "unmatched"), status
+        ).observe(time.perf_counter() - start)
+
+
+def on_task_publish(headers=None, **kwargs):
+    if headers is not None:
+        headers["enqueued_at"] = time.time()
+
+
+def on_task_prerun(task=None, **kwargs):
+    enqueued_at = getattr(task.request, "enqueued_at", None)
+    if enqueued_at is None:
+        enqueued_at = (task.request.headers or {}).get("enqueued_at")
+    if enqueued_at is not None:
+        CELERY_QUEUE_LATENCY.labels(task.name).observe(time.time() - enqueued_at)
+
+
+def on_task_failure(sender=None, **kwargs):
+    CELERY_TASK_FAILURES.labels(sender.name).inc()
+
+
+router_metrics = APIRouter(tags=["Metrics"])
+
+
+@router_metrics.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    return Response(generate_latest(registry()), media_type=CONTENT_TYPE_LATEST)
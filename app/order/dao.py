@@ -1,11 +1,286 @@
+from functools import partial
+from typing import Optional
+
+from sqlalchemy import (
+    Integer,
+    column,
+    literal,
+    delete,
+    func,
+    insert,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.invalidation import invalidate_products
 from app.database.base_dao import BaseDAO
-from app.database.models import Order
-from app.database.models.order_model import OrderItem
+from app.database.base_db import after_commit, session_scope
+from app.database.pagination import build_page, paginate_keyset
+from app.database.models import Basket, BasketItem, Order, Product, Reservation
+from app.database.models.order_model import OrderItem, OrderOutbox, PaymentType
+from app.exception.order_exceptions import EmptyBasketError, NotEnoughProductError
+
+# Канал NOTIFY, по которому relay узнает о новых событиях без ожидания опроса
+ORDER_OUTBOX_CHANNEL = "order_outbox"
+ORDER_CONFIRMATION_EVENT = "order_confirmation"
 
 
 class OrderDAO(BaseDAO):
     model = Order
 
+    @classmethod
+    async def checkout(
+        cls,
+        user_id: int,
+        payment_method: PaymentType,
+        session: Optional[AsyncSession] = None,
+    ):
+        """
+        Оформляет заказ из корзины пользователя в одной транзакции: блокирует
+        товары, создает заказ и его позиции, списывает остатки, снимает резервы
+        корзины и очищает ее. Возвращает строку заказа с позициями в items.
+        """
+        async with session_scope(session) as session:
+            basket_id = await session.scalar(
+                select(Basket.id).filter_by(user_id=user_id)
+            )
+
+            # Резервы корзины блокируются раньше товаров — в том же порядке,
+            # что и при их снятии, чтобы не было взаимных блокировок
+            held = dict(
+                (
+                    await session.execute(
+                        select(Reservation.product_id, Reservation.quantity)
+                        .filter_by(basket_id=basket_id)
+                        .with_for_update()
+                    )
+                ).all()
+            )
+
+            # Одним запросом читаем позиции корзины и блокируем строки товаров.
+            # Порядок по id товара исключает взаимные блокировки между покупателями
+            query = (
+                select(
+                    BasketItem.basket_id,
+                    BasketItem.product_id,
+                    BasketItem.quantity,
+                    BasketItem.price,
+                    Product.name,
+                    Product.category_id,
+                    Product.quantity.label("stock"),
+                    Product.reserved,
+                )
+                .join(Product, Product.id == BasketItem.product_id)
+                .where(BasketItem.basket_id == basket_id)
+                .order_by(Product.id)
+                .with_for_update(of=Product)
+            )
+            items = (await session.execute(query)).mappings().all()
+            if not items:
+                raise EmptyBasketError
+
+            # Доступно: свободный остаток плюс собственный резерв корзины
+            for item in items:
+                available = (
+                    item["stock"] - item["reserved"] + held.get(item["product_id"], 0)
+                )
+                if available < item["quantity"]:
+                    raise NotEnoughProductError(item["name"])
+
+            total_price = sum(item["price"] * item["quantity"] for item in items)
+
+            order = (
+                (
+                    await session.execute(
+                        insert(Order)
+                        .values(
+                            user_id=user_id,
+                            total_price=total_price,
+                            status="completed",
+                            payment_method=payment_method,
+                        )
+                        .returning(*Order.__table__.columns)
+                    )
+                )
+                .mappings()
+                .one()
+            )
+
+            # Позиции вставляются одним INSERT ... RETURNING, как и заголовок
+            # заказа, поэтому перечитывать их после оформления не нужно
+            order_items = (
+                (
+                    await session.execute(
+                        insert(OrderItem)
+                        .values(
+                            [
+                                {
+                                    "basket_id": item["basket_id"],
+                                    "product_id": item["product_id"],
+                                    "order_id": order["id"],
+                                    "quantity": item["quantity"],
+                                    "price": item["price"],
+                                }
+                                for item in items
+                            ]
+                        )
+                        .returning(*OrderItem.__table__.columns)
+                    )
+                )
+                .mappings()
+                .all()
+            )
+
+            # Списываем остатки и резервы одним UPDATE ... FROM (VALUES ...)
+            purchased = values(
+                column("product_id", Integer),
+                column("quantity", Integer),
+                column("released", Integer),
+                name="purchased",
+            ).data(
+                [
+                    (
+                        item["product_id"],
+                        item["quantity"],
+                        held.get(item["product_id"], 0),
+                    )
+                    for item in items
+                ]
+            )
+            await session.execute(
+                update(Product)
+                .where(Product.id == purchased.c.product_id)
+                .values(
+                    quantity=Product.quantity - purchased.c.quantity,
+                    reserved=Product.reserved - purchased.c.released,
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+            await session.execute(delete(Reservation).filter_by(basket_id=basket_id))
+
+            await session.execute(delete(BasketItem).filter_by(basket_id=basket_id))
+
+            # Остатки изменились: после фиксации очищаем кэш купленных товаров
+            after_commit(
+                session,
+                partial(
+                    invalidate_products,
+                    [
+                        {"id": item["product_id"], "category_id": item["category_id"]}
+                        for item in items
+                    ],
+                ),
+            )
+
+        return {**order, "items": order_items}
+
+    @classmethod
+    async def find_history(
+        cls,
+        user_id: int,
+        limit: int = 20,
+        after: Optional[str] = None,
+        session: Optional[AsyncSession] = None,
+    ):
+        """
+        Возвращает страницу заказов пользователя от новых к старым вместе с
+        позициями и названиями товаров одним запросом: позиции собираются
+        в JSON коррелированным подзапросом только для строк страницы.
+        """
+        items = (
+            select(
+                func.coalesce(
+                    func.jsonb_agg(
+                        aggregate_order_by(
+                            func.jsonb_build_object(
+                                "product_id",
+                                OrderItem.product_id,
+                                "name",
+                                Product.name,
+                                "quantity",
+                                OrderItem.quantity,
+                                "price",
+                                OrderItem.price,
+                            ),
+                            OrderItem.id,
+                        )
+                    ),
+                    literal([], JSONB),
+                )
+            )
+            .join(Product, Product.id == OrderItem.product_id)
+            .where(OrderItem.order_id == Order.id)
+            .correlate(Order)
+            .scalar_subquery()
+        )
+        columns = (Order.id,)
+        query = paginate_keyset(
+            select(
+                Order.id,
+                Order.total_price,
+                Order.status,
+                Order.payment_method,
+                items.label("items"),
+            ).where(Order.user_id == user_id),
+            columns,
+            after,
+            limit,
+            descending=True,
+        )
+        async with session_scope(session, read_only=True) as session:
+            result = await session.execute(query)
+            return build_page(result.mappings().all(), columns, limit)
+
 
 class OrderItemDAO(BaseDAO):
     model = OrderItem
+
+
+class OrderOutboxDAO(BaseDAO):
+    model = OrderOutbox
+
+    @classmethod
+    async def add_event(
+        cls,
+        order_id: int,
+        event: str,
+        payload: dict,
+        session: Optional[AsyncSession] = None,
+    ):
+        """
+        Записывает событие заказа в транзакции заказа. NOTIFY доставляется
+        слушателям только после фиксации, а при откате пропадает вместе
+        с событием.
+        """
+        async with session_scope(session) as session:
+            await session.execute(
+                insert(OrderOutbox).values(
+                    order_id=order_id, event=event, payload=payload
+                )
+            )
+            await session.execute(select(func.pg_notify(ORDER_OUTBOX_CHANNEL, event)))
+
+    @classmethod
+    async def claim_batch(cls, limit: int, session: AsyncSession) -> list:
+        """
+        Удаляет и возвращает до limit самых старых событий. Строки, которые
+        сейчас публикует другой relay, пропускаются (SKIP LOCKED); если
+        публикация не удалась, откат транзакции возвращает события в таблицу.
+        """
+        batch = (
+            select(OrderOutbox.id)
+            .order_by(OrderOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            delete(OrderOutbox)
+            .where(OrderOutbox.id.in_(batch.scalar_subquery()))
+            .returning(*OrderOutbox.__table__.columns)
+            .execution_options(synchronize_session=False)
+        )
+        return sorted(result.mappings().all(), key=lambda row: row["id"])
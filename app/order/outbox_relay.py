@@ -0,0 +1,100 @@
+"""
+Relay событий заказов из таблицы order_outbox в очередь писем Redis.
+
+Событие пишется в транзакции заказа, поэтому оформление заказа не зависит
+от доступности брокера, а упавший после фиксации процесс не теряет письмо.
+Relay забирает события пачками (DELETE ... SKIP LOCKED, можно запускать
+несколько экземпляров) и публикует пачку одной командой RPUSH. Доставка —
+«хотя бы один раз»: ключ outbox:published:{id} в Redis не дает повторно
+опубликовать событие, если фиксация удаления не прошла после публикации.
+
+Новые события приходят через LISTEN/NOTIFY; раз в OUTBOX_POLL_INTERVAL
+таблица проверяется и без уведомления (на случай потерянного соединения).
+
+    python -m app.order.outbox_relay
+"""
+
+import asyncio
+import logging
+
+from app.config import settings
+from app.database.base_db import engine, session_scope
+from app.order.dao import ORDER_CONFIRMATION_EVENT, ORDER_OUTBOX_CHANNEL, OrderOutboxDAO
+from app.tasks.mailer import get_redis, queue_order_confirmations
+
+logger = logging.getLogger(__name__)
+
+PUBLISHED_KEY = "outbox:published:{id}"
+PUBLISHED_TTL = 24 * 60 * 60
+
+
+def publish(events: list) -> int:
+    """
+    Ставит письма по событиям в очередь, пропуская уже опубликованные.
+    Если публикация не удалась, отметки снимаются, а исключение откатывает
+    удаление событий.
+    """
+    redis = get_redis()
+    pipe = redis.pipeline()
+    for event in events:
+        pipe.set(PUBLISHED_KEY.format(id=event["id"]), 1, nx=True, ex=PUBLISHED_TTL)
+    fresh = [event for event, is_new in zip(events, pipe.execute()) if is_new]
+
+    confirmations = []
+    for event in fresh:
+        if event["event"] == ORDER_CONFIRMATION_EVENT:
+            payload = event["payload"]
+            confirmations.append((payload["order"], payload["email_to"]))
+        else:
+            logger.warning("Unknown outbox event %s", event["event"])
+    try:
+        queue_order_confirmations(confirmations)
+    except Exception:
+        if fresh:
+            redis.delete(*(PUBLISHED_KEY.format(id=event["id"]) for event in fresh))
+        raise
+    return len(fresh)
+
+
+async def relay_pending(batch_size: int) -> int:
+    """
+    Публикует все накопившиеся события пачками по batch_size и возвращает,
+    сколько событий опубликовано.
+    """
+    published = 0
+    while True:
+        async with session_scope() as session:
+            events = await OrderOutboxDAO.claim_batch(batch_size, session)
+            if events:
+                published += await asyncio.to_thread(publish, events)
+        if len(events) < batch_size:
+            return published
+
+
+async def run_relay(batch_size: int, poll_interval: float) -> None:
+    wakeup = asyncio.Event()
+    async with engine.connect() as connection:
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.add_listener(
+            ORDER_OUTBOX_CHANNEL, lambda *args: wakeup.set()
+        )
+        logger.info("Listening on %s", ORDER_OUTBOX_CHANNEL)
+        while True:
+            # Сбрасываем флаг до выборки: уведомление, пришедшее во время
+            # публикации, вызовет еще один проход
+            wakeup.clear()
+            try:
+                published = await relay_pending(batch_size)
+                if published:
+                    logger.info("Published %s outbox events", published)
+            except Exception:
+                logger.exception("Outbox relay failed, retrying")
+            try:
+                await asyncio.wait_for(wakeup.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_relay(settings.OUTBOX_BATCH_SIZE, settings.OUTBOX_POLL_INTERVAL))
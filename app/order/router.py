@@ -1,12 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import parse_obj_as
+from typing import Optional
 
-from app.basket.dao import BasketDAO, BasketItemDAO
-from app.database.models.order_model import PaymentType, OrderItem
-from app.order.dao import OrderDAO, OrderItemDAO
-from app.order.schemas import OrderRead
-from app.product.dao import ProductDAO
-from app.tasks.tasks import send_order_confirmation_email
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.base_db import get_session
+from app.database.models.order_model import PaymentType
+from app.exception.base_exceptions import InvalidCursorError
+from app.exception.order_exceptions import EmptyBasketError, NotEnoughProductError
+from app.order.dao import ORDER_CONFIRMATION_EVENT, OrderDAO, OrderOutboxDAO
+from app.order.schemas import OrderHistoryPage, OrderRead
 from app.user.dependencies import get_current_user
 from app.user.schemas import UserRead
 
@@ -16,80 +18,57 @@ route_buy = APIRouter(prefix="/buy", tags=["Buy"])
 
 @route_buy.post("/items")
 async def purchase_items(
-    payment_method: PaymentType, user: UserRead = Depends(get_current_user)
+    payment_method: PaymentType,
+    user: UserRead = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
     """
     Эта функция обрабатывает покупку всех товаров, находящихся в корзине пользователя.
     Если в корзине нет товаров или запрашиваемое количество товара превышает его наличие на складе,
     возвращает соответствующую ошибку.
     """
-    basket = await BasketDAO.find_one_or_none(user_id=user.id)
-    basket_items = await BasketItemDAO.find_all(basket_id=basket.id)
-    if not basket_items:
-        raise HTTPException(status_code=404, detail="Корзина пуста")
-
-    total_price = 0
-    lst_basket_items = []
-
-    # Обрабатываем каждый товар в корзине
-    for item in basket_items:
-        product = await ProductDAO.find_one_or_none(id=item.product_id)
-
-        # Если продукт не найден, возвращаем ошибку 404
-        if not product:
-            raise HTTPException(
-                status_code=404, detail=f"Продукт с ID {item.product_id} не найден"
-            )
-
-        # Если количество товара на складе недостаточно, возвращаем ошибку 400
-        if product["quantity"] < item.quantity:
-            raise HTTPException(
-                status_code=400, detail=f"Недостаточно товара {product.name} на складе"
-            )
-
-        # Считаем общую стоимость товаров в корзине
-        total_price += item.price * item.quantity
-
-        # Создаем объект для нового элемента заказа
-        basket_item = OrderItem(
-            basket_id=item.basket_id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price=item.price,
+    try:
+        # Оформляем заказ одной транзакцией с блокировкой остатков
+        order = await OrderDAO.checkout(user.id, payment_method, session)
+
+        # Подтверждение записывается в outbox той же транзакцией: письмо
+        # опубликует relay, а брокер не влияет на время оформления заказа
+        # mode="json": сумма с копейками попадает в JSONB строкой без потерь
+        order_dict = OrderRead.model_validate(order).model_dump(mode="json")
+        await OrderOutboxDAO.add_event(
+            order["id"],
+            ORDER_CONFIRMATION_EVENT,
+            {"order": order_dict, "email_to": user.email},
+            session,
         )
-        lst_basket_items.append(basket_item)
 
-    # Создаем новый заказ в базе данных
-    order = await OrderDAO.add(
-        user_id=user.id,
-        total_price=total_price,
-        status="completed",
-        payment_method=payment_method,
-    )
+        await session.commit()
 
-    # Добавляем товары из корзины в новый заказ
-    for item in lst_basket_items:
-        order_items = await OrderItemDAO.add(
-            basket_id=item.basket_id,
-            product_id=item.product_id,
-            order_id=order["id"],
-            quantity=item.quantity,
-            price=item.price,
-        )
+        # Обрабатываем случай, когда корзина пуста
+    except EmptyBasketError:
+        raise HTTPException(status_code=404, detail="Корзина пуста")
 
-    # Обновляем количество товара на складе после покупки
-    for item in lst_basket_items:
-        product = await ProductDAO.find_one_or_none(id=item.product_id)
-        update_quantity = await ProductDAO.update(
-            item.product_id, quantity=product.quantity - item.quantity
+        # Обрабатываем случай, когда товара на складе недостаточно
+    except NotEnoughProductError as error:
+        raise HTTPException(
+            status_code=400, detail=f"Недостаточно товара {error.args[0]} на складе"
         )
 
-    # Очищаем корзину пользователя после завершения покупки
-    await BasketItemDAO.delete(basket_id=basket.id)
+    return order
 
-    # Извлекаем информацию о заказе и отправляем подтверждение по электронной почте
-    order = await OrderDAO.find_one_or_none(id=order["id"])
-    order_dict = parse_obj_as(OrderRead, order).dict()
-    send_order_confirmation_email.delay(order_dict, user.email)
 
-    return order
+@route_buy.get("/history")
+async def get_order_history(
+    limit: int = Query(20, ge=1, le=100, description="Number of orders to return"),
+    after: Optional[str] = Query(None, description="Cursor of the next page"),
+    user: UserRead = Depends(get_current_user),
+) -> OrderHistoryPage:
+    """
+    Эта функция возвращает заказы пользователя от новых к старым вместе с
+    товарами в них. Для следующей страницы нужно передать next_cursor из ответа
+    в параметр after.
+    """
+    try:
+        return await OrderDAO.find_history(user.id, limit, after)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
@@ -1,11 +1,34 @@
 from decimal import Decimal
 from enum import Enum
 
+from typing import Optional
+
 from pydantic import BaseModel
 
 
 class OrderRead(BaseModel):
     user_id: int
-    total_price: int
+    total_price: Decimal
     status: str
     payment_method: str
+
+
+class OrderHistoryItem(BaseModel):
+    product_id: int
+    name: str
+    quantity: int
+    price: Decimal
+
+
+class OrderHistoryRead(BaseModel):
+    id: int
+    total_price: Decimal
+    status: str
+    payment_method: str
+    items: list[OrderHistoryItem]
+
+
+class OrderHistoryPage(BaseModel):
+    items: list[OrderHistoryRead]
+    next_cursor: Optional[str]
+    has_more: bool
@@ -0,0 +1,281 @@
+"""
+Потоковый импорт и экспорт каталога товаров в CSV и NDJSON.
+
+Файл читается и проверяется пачками по batch_size строк, каждая пачка
+записывается в своей транзакции, поэтому память ограничена размером пачки.
+Строки с id обновляют существующие товары (INSERT ... ON CONFLICT), строки
+без id добавляются. Категорию можно указать через category_id или по
+названию в колонке category.
+
+    python -m app.product.bulk import catalog.csv
+    python -m app.product.bulk export --format ndjson > catalog.ndjson
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+from contextlib import aclosing
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional, TextIO
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.cache.invalidation import (
+    CATEGORY_NAMESPACE,
+    PRODUCT_LIST_NAMESPACE,
+    PRODUCT_NAMESPACE,
+    clear_namespaces,
+)
+from app.category.dao import CategoryDAO
+from app.database.base_db import session_scope
+from app.product.dao import ProductDAO
+from app.product.schemas import BulkFormat, ProductImport
+
+EXPORT_COLUMNS = ("id", "name", "description", "price", "quantity", "category_id")
+
+# Сколько ошибок строк попадает в отчет (остальные только считаются)
+MAX_REPORTED_ERRORS = 100
+
+batch_adapter = TypeAdapter(list[ProductImport])
+
+
+def read_rows(stream: TextIO, format: BulkFormat) -> Iterator:
+    """
+    Построчно разбирает файл. Пустые значения CSV считаются отсутствующими;
+    строки NDJSON, которые не удалось разобрать, передаются дальше как есть
+    и отклоняются при проверке.
+    """
+    if format == BulkFormat.csv:
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if value not in ("", None)}
+    else:
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
+
+
+def validate_batch(
+    batch: list, first_row: int
+) -> tuple[list[tuple[int, ProductImport]], list]:
+    """
+    Проверяет пачку строк одним вызовом pydantic и возвращает корректные
+    строки и ошибки с номерами строк данных (с 1).
+    """
+    try:
+        products = batch_adapter.validate_python(batch)
+        return list(enumerate(products, first_row)), []
+    except ValidationError as error:
+        failed = {}
+        for item in error.errors(include_url=False, include_input=False):
+            index = item["loc"][0]
+            field = ".".join(str(part) for part in item["loc"][1:])
+            failed.setdefault(index, []).append(
+                f"{field}: {item['msg']}" if field else item["msg"]
+            )
+    valid = [
+        (first_row + index, ProductImport.model_validate(row))
+        for index, row in enumerate(batch)
+        if index not in failed
+    ]
+    errors = [
+        {"row": first_row + index, "errors": messages}
+        for index, messages in sorted(failed.items())
+    ]
+    return valid, errors
+
+
+def reject_duplicate_ids(
+    products: list[tuple[int, ProductImport]],
+) -> tuple[list[tuple[int, ProductImport]], list]:
+    """
+    Оставляет для каждого id последнюю строку пачки, как если бы строки
+    записывались по порядку: один INSERT ... ON CONFLICT не может обновить
+    строку дважды. Более ранние строки с тем же id отклоняются.
+    """
+    last_row = {product.id: row for row, product in products if product.id is not None}
+    valid, errors = [], []
+    for row, product in products:
+        if product.id is None or last_row[product.id] == row:
+            valid.append((row, product))
+        else:
+            errors.append(
+                {
+                    "row": row,
+                    "errors": [f"id: duplicated in row {last_row[product.id]}"],
+                }
+            )
+    return valid, errors
+
+
+async def reject_unknown_categories(
+    products: list[tuple[int, ProductImport]], session
+) -> tuple[list[tuple[int, ProductImport]], list]:
+    """
+    Отклоняет строки, у которых category_id указывает на несуществующую
+    категорию, вместо ошибки внешнего ключа на всю пачку.
+    """
+    known = await CategoryDAO.existing_ids(
+        (
+            product.category_id
+            for _, product in products
+            if product.category_id is not None
+        ),
+        session,
+    )
+    valid, errors = [], []
+    for row, product in products:
+        if product.category_id is None or product.category_id in known:
+            valid.append((row, product))
+        else:
+            errors.append({"row": row, "errors": ["category_id: category not found"]})
+    return valid, errors
+
+
+async def import_products(
+    stream: TextIO,
+    format: BulkFormat,
+    batch_size: int = 1000,
+    on_progress: Optional[Callable[[dict], Awaitable[None]]] = None,
+) -> dict:
+    """
+    Импортирует товары из потока и возвращает отчет: сколько строк
+    прочитано, записано и отклонено, и первые MAX_REPORTED_ERRORS ошибок.
+    """
+    rows = read_rows(stream, format)
+    report = {"processed": 0, "imported": 0, "failed": 0, "errors": []}
+
+    while True:
+        # Чтение и разбор файла блокируют, поэтому выполняются в потоке
+        batch = await asyncio.to_thread(lambda: list(islice(rows, batch_size)))
+        if not batch:
+            break
+
+        products, errors = validate_batch(batch, report["processed"] + 1)
+        products, duplicates = reject_duplicate_ids(products)
+        async with session_scope() as session:
+            products, unknown = await reject_unknown_categories(products, session)
+            category_ids = await CategoryDAO.ids_by_name(
+                (
+                    product.category
+                    for _, product in products
+                    if product.category_id is None
+                ),
+                session,
+            )
+            with_id, without_id = [], []
+            for _, product in products:
+                row = product.model_dump(exclude={"category"})
+                if row["category_id"] is None:
+                    row["category_id"] = category_ids[product.category]
+                if row["id"] is None:
+                    del row["id"]
+                    without_id.append(row)
+                else:
+                    with_id.append(row)
+
+            await ProductDAO.upsert_many(with_id, session=session)
+            if with_id:
+                # Сдвигаем последовательность до вставки строк без id,
+                # иначе они могут получить id из этой или прошлых пачек
+                await ProductDAO.sync_id_sequence(session)
+            await ProductDAO.add_many(without_id, session)
+
+        errors = sorted(errors + duplicates + unknown, key=lambda error: error["row"])
+        report["processed"] += len(batch)
+        report["imported"] += len(products)
+        report["failed"] += len(errors)
+        free = MAX_REPORTED_ERRORS - len(report["errors"])
+        report["errors"].extend(errors[:free])
+        if on_progress is not None:
+            await on_progress(report)
+
+    await clear_namespaces(
+        [PRODUCT_NAMESPACE, PRODUCT_LIST_NAMESPACE, CATEGORY_NAMESPACE]
+    )
+    return report
+
+
+async def export_products(
+    format: BulkFormat, batch_size: int = 1000
+) -> AsyncIterator[str]:
+    """
+    Отдает каталог кусками текста, по одному на пачку строк серверного курсора.
+    """
+    if format == BulkFormat.csv:
+        yield ",".join(EXPORT_COLUMNS) + "\r\n"
+
+    # aclosing закрывает курсор и сессию, даже если клиент прервал выгрузку
+    async with aclosing(ProductDAO.stream_all(batch_size)) as batches:
+        async for rows in batches:
+            if format == BulkFormat.csv:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(
+                    [row[column] for column in EXPORT_COLUMNS] for row in rows
+                )
+                yield buffer.getvalue()
+            else:
+                yield "".join(
+                    json.dumps(
+                        {column: row[column] for column in EXPORT_COLUMNS}, default=str
+                    )
+                    + "\n"
+                    for row in rows
+                )
+
+
+def guess_format(filename: Optional[str]) -> BulkFormat:
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return BulkFormat.ndjson
+    return BulkFormat.csv
+
+
+async def print_progress(report: dict) -> None:
+    print(
+        f"processed={report['processed']} imported={report['imported']} "
+        f"failed={report['failed']}",
+        file=sys.stderr,
+    )
+
+
+async def run_import(path: str, format: BulkFormat, batch_size: int) -> int:
+    with open(path, encoding="utf-8", newline="") as stream:
+        report = await import_products(stream, format, batch_size, print_progress)
+    for error in report["errors"]:
+        print(f"row {error['row']}: {'; '.join(error['errors'])}", file=sys.stderr)
+    return 1 if report["failed"] else 0
+
+
+async def run_export(format: BulkFormat, batch_size: int) -> int:
+    async with aclosing(export_products(format, batch_size)) as chunks:
+        async for chunk in chunks:
+            sys.stdout.write(chunk)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", type=BulkFormat)
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("--format", type=BulkFormat, default=BulkFormat.csv)
+    export_parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        coroutine = run_import(
+            args.path, args.format or guess_format(args.path), args.batch_size
+        )
+    else:
+        coroutine = run_export(args.format, args.batch_size)
+    sys.exit(asyncio.run(coroutine))
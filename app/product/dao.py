@@ -1,16 +1,270 @@
-from sqlalchemy import select
+import re
+from decimal import Decimal
+from functools import partial
+from typing import Optional
 
+from sqlalchemy import (
+    Float,
+    and_,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.invalidation import invalidate_products
 from app.database.base_dao import BaseDAO
-from app.database.base_db import session_factory
-from app.database.models import Product
+from app.database.base_db import after_commit, session_scope
+from app.database.models import Category, Product
+from app.database.pagination import build_page, paginate_keyset
+from app.product.schemas import ProductField, ProductSort
+
+# Генерируемая колонка из миграции add_product_search (в модель не входит)
+SEARCH_VECTOR = literal_column("products.search_vector", TSVECTOR)
+SEARCH_CONFIG = "russian"
 
 
 class ProductDAO(BaseDAO):
     model = Product
 
+    # Ключи сортировки для keyset-пагинации; id - уникальный тайбрейкер
+    sort_keys = {
+        ProductSort.id: (Product.id,),
+        ProductSort.price: (Product.price, Product.id),
+        ProductSort.name: (Product.name, Product.id),
+        ProductSort.newest: (Product.id,),
+    }
+    descending_sorts = {ProductSort.newest}
+
     @classmethod
-    async def find_all_products(cls, limit: int = 5, offset: int = 0):
-        async with session_factory() as session:
+    async def update(cls, id, session: Optional[AsyncSession] = None, **data):
+        """
+        Обновляет товар и после фиксации транзакции очищает его кэш.
+        """
+        query = (
+            update(cls.model)
+            .values(**data)
+            .filter_by(id=id)
+            .returning(cls.model.id, cls.model.category_id)
+        )
+        async with session_scope(session) as session:
+            result = (await session.execute(query)).mappings().first()
+            if result:
+                after_commit(session, partial(invalidate_products, [result]))
+            return result
+
+    @classmethod
+    async def find_all_products(
+        cls, limit: int = 5, offset: int = 0, session: Optional[AsyncSession] = None
+    ):
+        async with session_scope(session, read_only=True) as session:
             query = select(cls.model.__table__.columns).limit(limit).offset(offset)
             result = await session.execute(query)
             return result.mappings().all()
+
+    @classmethod
+    async def stream_all(
+        cls, batch_size: int = 1000, session: Optional[AsyncSession] = None
+    ):
+        """
+        Отдает все товары пачками по batch_size через серверный курсор,
+        не загружая таблицу в память целиком.
+        """
+        query = (
+            select(cls.model.__table__.columns)
+            .order_by(cls.model.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async with session_scope(session, read_only=True) as session:
+            result = await session.stream(query)
+            async for rows in result.mappings().partitions():
+                yield rows
+
+    @classmethod
+    async def sync_id_sequence(cls, session: Optional[AsyncSession] = None):
+        """
+        Сдвигает последовательность id после вставки строк с явными id.
+        """
+        table = cls.model.__table__
+        query = select(
+            func.setval(
+                func.pg_get_serial_sequence(table.name, "id"),
+                select(func.coalesce(func.max(table.c.id), 0) + 1).scalar_subquery(),
+                False,
+            )
+        )
+        async with session_scope(session) as session:
+            await session.execute(query)
+
+    @classmethod
+    async def find_products_page(
+        cls,
+        limit: int = 20,
+        after: Optional[str] = None,
+        sort: ProductSort = ProductSort.id,
+        session: Optional[AsyncSession] = None,
+    ):
+        """
+        Возвращает страницу товаров с keyset-пагинацией по курсору after.
+        """
+        columns = cls.sort_keys[sort]
+        query = paginate_keyset(
+            select(cls.model.__table__.columns),
+            columns,
+            after,
+            limit,
+            descending=sort in cls.descending_sorts,
+        )
+        async with session_scope(session, read_only=True) as session:
+            result = await session.execute(query)
+            return build_page(result.mappings().all(), columns, limit)
+
+    @classmethod
+    async def find_category_page(
+        cls,
+        category_id: int,
+        limit: int = 20,
+        after: Optional[str] = None,
+        sort: ProductSort = ProductSort.id,
+        fields: Optional[list[ProductField]] = None,
+        session: Optional[AsyncSession] = None,
+    ):
+        """
+        Возвращает страницу товаров категории с keyset-пагинацией по индексу
+        (category_id, ключ сортировки). fields ограничивает выбираемые
+        колонки; id возвращается всегда, а колонки ключа сортировки
+        выбираются для курсора, но в ответ попадают, только если запрошены.
+        """
+        names = list(
+            dict.fromkeys(["id", *(field.value for field in fields or ProductField)])
+        )
+        columns = cls.sort_keys[sort]
+        table = cls.model.__table__
+        selected = dict.fromkeys([*names, *(column.key for column in columns)])
+        query = paginate_keyset(
+            select(*(table.c[name] for name in selected)).where(
+                table.c.category_id == category_id
+            ),
+            columns,
+            after,
+            limit,
+            descending=sort in cls.descending_sorts,
+        )
+        async with session_scope(session, read_only=True) as session:
+            result = await session.execute(query)
+            page = build_page(result.mappings().all(), columns, limit)
+        page["items"] = [{name: row[name] for name in names} for row in page["items"]]
+        return page
+
+    # Установлено ли расширение pg_trgm (проверяется один раз на процесс)
+    _trigram: Optional[bool] = None
+
+    @classmethod
+    async def has_trigram(cls, session: AsyncSession) -> bool:
+        if cls._trigram is None:
+            cls._trigram = await session.scalar(
+                text(
+                    "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+                )
+            )
+        return cls._trigram
+
+    @classmethod
+    async def search_filter(
+        cls,
+        phrase: str,
+        min_price: Optional[Decimal],
+        max_price: Optional[Decimal],
+        in_stock: bool,
+        session: AsyncSession,
+    ):
+        """
+        Строит условие поиска и выражение релевантности. Слова запроса ищутся
+        в search_vector (индекс GIN), последнее — по префиксу, как при вводе;
+        с pg_trgm название дополнительно сравнивается по сходству триграмм,
+        что находит слова с опечатками.
+        """
+        words = re.findall(r"\w+", phrase)
+        query = func.to_tsquery(
+            literal(SEARCH_CONFIG, REGCONFIG),
+            " & ".join(words[:-1] + [f"{word}:*" for word in words[-1:]]),
+        )
+        match = SEARCH_VECTOR.op("@@")(query)
+        rank = func.ts_rank_cd(SEARCH_VECTOR, query)
+        if await cls.has_trigram(session):
+            match = or_(match, Product.name.op("%")(phrase))
+            rank = rank + func.similarity(Product.name, phrase)
+
+        conditions = [match]
+        if min_price is not None:
+            conditions.append(Product.price >= min_price)
+        if max_price is not None:
+            conditions.append(Product.price <= max_price)
+        if in_stock:
+            conditions.append(Product.quantity - Product.reserved > 0)
+        # Точность double нужна, чтобы значение из курсора совпадало с рангом
+        return and_(*conditions), rank.cast(Float(53)).label("rank")
+
+    @classmethod
+    async def search(
+        cls,
+        phrase: str,
+        limit: int = 20,
+        after: Optional[str] = None,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        in_stock: bool = False,
+        category_id: Optional[int] = None,
+        session: Optional[AsyncSession] = None,
+    ):
+        """
+        Возвращает страницу найденных товаров по убыванию релевантности
+        с keyset-пагинацией по (rank, id).
+        """
+        async with session_scope(session, read_only=True) as session:
+            condition, rank = await cls.search_filter(
+                phrase, min_price, max_price, in_stock, session
+            )
+            query = select(cls.model.__table__.columns, rank).where(condition)
+            if category_id is not None:
+                query = query.where(Product.category_id == category_id)
+            columns = (rank, Product.id)
+            query = paginate_keyset(query, columns, after, limit, descending=True)
+            result = await session.execute(query)
+            return build_page(result.mappings().all(), columns, limit)
+
+    @classmethod
+    async def search_facets(
+        cls,
+        phrase: str,
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        in_stock: bool = False,
+        session: Optional[AsyncSession] = None,
+    ):
+        """
+        Считает найденные товары по категориям (без учета пагинации).
+        """
+        async with session_scope(session, read_only=True) as session:
+            condition, _ = await cls.search_filter(
+                phrase, min_price, max_price, in_stock, session
+            )
+            query = (
+                select(
+                    Category.id.label("category_id"),
+                    Category.name,
+                    func.count().label("count"),
+                )
+                .select_from(Product)
+                .join(Category, Category.id == Product.category_id)
+                .where(condition)
+                .group_by(Category.id)
+                .order_by(func.count().desc(), Category.id)
+            )
+            result = await session.execute(query)
+            return result.mappings().all()
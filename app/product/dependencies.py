@@ -0,0 +1,32 @@
+from fastapi import Request
+from fastapi.dependencies.utils import get_flat_dependant
+from fastapi.exceptions import RequestValidationError
+
+# Имена query-параметров, объявленных у маршрута (считаются один раз)
+_known_params: dict[str, frozenset[str]] = {}
+
+
+async def forbid_unknown_params(request: Request) -> None:
+    """
+    Отклоняет запрос с query-параметрами, которых маршрут не объявляет (422).
+    Иначе опечатка в имени фильтра молча игнорируется и выдача не фильтруется.
+    """
+    route = request.scope["route"]
+    known = _known_params.get(route.unique_id)
+    if known is None:
+        dependant = get_flat_dependant(route.dependant)
+        known = frozenset(param.alias for param in dependant.query_params)
+        _known_params[route.unique_id] = known
+    unknown = sorted(set(request.query_params) - known)
+    if unknown:
+        raise RequestValidationError(
+            [
+                {
+                    "type": "extra_forbidden",
+                    "loc": ("query", name),
+                    "msg": "Unknown filter parameter",
+                    "input": request.query_params[name],
+                }
+                for name in unknown
+            ]
+        )
@@ -1,15 +1,47 @@
 import asyncio
-from fastapi import APIRouter, HTTPException, Query
-from fastapi_cache.decorator import cache
+import io
+import json
+import logging
+import shutil
+import tempfile
+from decimal import Decimal
+from typing import Optional
 
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+
+from app.cache.decorator import cached
+from app.cache.invalidation import (
+    PRODUCT_LIST_NAMESPACE,
+    PRODUCT_NAMESPACE,
+    scoped_key_builder,
+)
+from app.exception.base_exceptions import InvalidCursorError
+from app.product.bulk import export_products, guess_format, import_products
 from app.product.dao import ProductDAO
-from app.product.schemas import ProductRead
+from app.product.dependencies import forbid_unknown_params
+from app.product.schemas import (
+    BulkFormat,
+    CategoryFacet,
+    ProductField,
+    ProductFieldsPage,
+    ProductPage,
+    ProductRead,
+    ProductSearchPage,
+    ProductSort,
+)
+from app.user.dependencies import get_current_admin
+
+logger = logging.getLogger(__name__)
+
+# Выполняющиеся импорты каталога (ссылки не дают сборщику мусора снять задачи)
+_imports: set[asyncio.Task] = set()
 
 router_product = APIRouter(prefix="/product", tags=["Product"])
 
 
 @router_product.get("/get_all_products")
-@cache(expire=30)
+@cached(PRODUCT_LIST_NAMESPACE, scoped_key_builder("all"))
 async def get_products(
     limit: int = Query(5, description="Number of products to return"),
     offset: int = Query(0, description="Number of products to skip"),
@@ -17,12 +49,67 @@ async def get_products(
     return await ProductDAO.find_all_products(limit, offset)
 
 
+@router_product.get("/list")
+@cached(PRODUCT_LIST_NAMESPACE, scoped_key_builder("all"))
+async def get_products_page(
+    limit: int = Query(20, ge=1, le=100, description="Number of products to return"),
+    after: Optional[str] = Query(None, description="Cursor of the next page"),
+    sort: ProductSort = Query(ProductSort.id, description="Sort key"),
+) -> ProductPage:
+    """
+    Эта функция возвращает страницу товаров с курсорной (keyset) пагинацией.
+    Для следующей страницы нужно передать next_cursor из ответа в параметр after.
+    """
+    try:
+        return await ProductDAO.find_products_page(limit, after, sort)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+@router_product.get("/search", dependencies=[Depends(forbid_unknown_params)])
+async def search_products(
+    q: str = Query(..., min_length=2, max_length=200, description="Search phrase"),
+    limit: int = Query(20, ge=1, le=100, description="Number of products to return"),
+    after: Optional[str] = Query(None, description="Cursor of the next page"),
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    in_stock: bool = Query(False, description="Only products available to buy"),
+    category_id: Optional[int] = Query(None),
+) -> ProductSearchPage:
+    """
+    Эта функция ищет товары по названию и описанию и возвращает их по убыванию
+    релевантности. Для следующей страницы нужно передать next_cursor из ответа
+    в параметр after.
+    """
+    try:
+        return await ProductDAO.search(
+            q, limit, after, min_price, max_price, in_stock, category_id
+        )
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+@router_product.get("/search/facets", dependencies=[Depends(forbid_unknown_params)])
+@cached(PRODUCT_LIST_NAMESPACE, scoped_key_builder("search"))
+async def search_facets(
+    q: str = Query(..., min_length=2, max_length=200, description="Search phrase"),
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    in_stock: bool = Query(False, description="Only products available to buy"),
+) -> list[CategoryFacet]:
+    """
+    Эта функция считает найденные товары по категориям. Результат кэшируется
+    и очищается при изменении товаров.
+    """
+    return await ProductDAO.search_facets(q, min_price, max_price, in_stock)
+
+
 @router_product.get("/get_product/{product_id}")
-@cache(expire=30)
+@cached(PRODUCT_NAMESPACE, scoped_key_builder("{product_id}"))
 async def get_product(product_id: int) -> ProductRead:
     """
     Эта функция извлекает информацию о товаре по его идентификатору. Если товар не найден,
-    возвращается ошибка 404. Результат кэшируется на 30 секунд для оптимизации производительности.
+    возвращается ошибка 404. Результат кэшируется и очищается при изменении товара.
     """
     product = await ProductDAO.find_one_or_none(id=product_id)
     if not product:
@@ -30,13 +117,92 @@ async def get_product(product_id: int) -> ProductRead:
     return product
 
 
-@router_product.get("/by_category/{category_id}")
-@cache(expire=30)
-async def get_products_by_category(category_id: int) -> list[ProductRead]:
+@router_product.get("/by_category/{category_id}", response_model_exclude_unset=True)
+@cached(PRODUCT_LIST_NAMESPACE, scoped_key_builder("category:{category_id}"))
+async def get_products_by_category(
+    category_id: int,
+    limit: int = Query(20, ge=1, le=100, description="Number of products to return"),
+    after: Optional[str] = Query(None, description="Cursor of the next page"),
+    sort: ProductSort = Query(ProductSort.id, description="Sort key"),
+    fields: Optional[list[ProductField]] = Query(
+        None, description="Fields to return (id is always included)"
+    ),
+) -> ProductFieldsPage:
+    """
+    Эта функция возвращает страницу товаров категории с курсорной пагинацией.
+    Для следующей страницы нужно передать next_cursor из ответа в параметр after.
+    Каждая страница кэшируется отдельно и очищается при изменении товаров
+    категории.
+    """
+    try:
+        return await ProductDAO.find_category_page(
+            category_id, limit, after, sort, fields
+        )
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+@router_product.post("/import", dependencies=[Depends(get_current_admin)])
+async def import_catalog(
+    file: UploadFile,
+    format: Optional[BulkFormat] = Query(None, description="csv or ndjson"),
+    batch_size: int = Query(1000, ge=1, le=5000),
+) -> StreamingResponse:
+    """
+    Эта функция импортирует каталог товаров из CSV или NDJSON. Ответ - поток
+    NDJSON: строка с прогрессом после каждой пачки и итоговый отчет с ошибками.
+    """
+    format = format or guess_format(file.filename)
+
+    # FastAPI закрывает загруженный файл до отправки тела ответа,
+    # поэтому импорт читает собственную копию
+    upload = tempfile.TemporaryFile()
+    await asyncio.to_thread(shutil.copyfileobj, file.file, upload)
+    upload.seek(0)
+    stream = io.TextIOWrapper(upload, encoding="utf-8", newline="")
+
+    queue = asyncio.Queue()
+
+    async def on_progress(report: dict):
+        await queue.put(
+            {key: value for key, value in report.items() if key != "errors"}
+        )
+
+    def finished(_):
+        stream.close()
+        _imports.discard(task)
+        queue.put_nowait(None)
+
+    # Импорт доводится до конца, даже если клиент отключился
+    task = asyncio.create_task(import_products(stream, format, batch_size, on_progress))
+    _imports.add(task)
+    task.add_done_callback(finished)
+
+    async def progress():
+        while (event := await queue.get()) is not None:
+            yield json.dumps(event) + "\n"
+        try:
+            yield json.dumps(await task) + "\n"
+        except Exception:
+            # Статус ответа уже отправлен: сообщаем об ошибке последней строкой
+            logger.exception("Catalog import failed")
+            yield json.dumps({"error": "Импорт прерван, см. журнал сервера"}) + "\n"
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+
+@router_product.get("/export", dependencies=[Depends(get_current_admin)])
+async def export_catalog(
+    format: BulkFormat = Query(BulkFormat.csv, description="csv or ndjson"),
+) -> StreamingResponse:
     """
-    Эта функция извлекает все товары, относящиеся к указанной категории,
-    на основе идентификатора категории. Результат кэшируется на 30 секунд
-    для оптимизации производительности.
+    Эта функция выгружает весь каталог товаров потоком через серверный курсор.
     """
-    products = await ProductDAO.find_all(category_id=category_id)
-    return products
+    media_type = "text/csv" if format == BulkFormat.csv else "application/x-ndjson"
+    return StreamingResponse(
+        export_products(format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="products.{format.value}"'
+        },
+    )
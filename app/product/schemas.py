@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel, Field, model_validator
 from decimal import Decimal
 
 
@@ -9,3 +12,79 @@ class ProductRead(BaseModel):
     price: Decimal
     quantity: int
     category_id: int
+
+
+class ProductSort(str, Enum):
+    id = "id"
+    price = "price"
+    name = "name"
+    newest = "newest"
+
+
+class ProductField(str, Enum):
+    id = "id"
+    name = "name"
+    description = "description"
+    price = "price"
+    quantity = "quantity"
+    category_id = "category_id"
+
+
+class ProductFields(BaseModel):
+    # Проекция ProductRead: в ответе только запрошенные поля
+    id: Optional[int] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[Decimal] = None
+    quantity: Optional[int] = None
+    category_id: Optional[int] = None
+
+
+class ProductPage(BaseModel):
+    items: list[ProductRead]
+    next_cursor: Optional[str]
+    has_more: bool
+
+
+class ProductFieldsPage(BaseModel):
+    items: list[ProductFields]
+    next_cursor: Optional[str]
+    has_more: bool
+
+
+class ProductSearchHit(ProductRead):
+    rank: float
+
+
+class ProductSearchPage(BaseModel):
+    items: list[ProductSearchHit]
+    next_cursor: Optional[str]
+    has_more: bool
+
+
+class CategoryFacet(BaseModel):
+    category_id: int
+    name: str
+    count: int
+
+
+class ProductImport(BaseModel):
+    id: Optional[int] = None
+    name: str = Field(max_length=255)
+    description: str = Field(max_length=255)
+    price: Decimal = Field(ge=0, max_digits=10, decimal_places=2)
+    quantity: int = Field(ge=0)
+    category_id: Optional[int] = None
+    # Название категории; если такой нет, она создается
+    category: Optional[str] = Field(None, max_length=60)
+
+    @model_validator(mode="after")
+    def check_category(self):
+        if self.category_id is None and not self.category:
+            raise ValueError("category_id or category is required")
+        return self
+
+
+class BulkFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
@@ -1,5 +1,14 @@
 from celery import Celery
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_prerun,
+    worker_init,
+)
+from prometheus_client import start_http_server
 
+from app.config import settings
+from app.metrics import on_task_failure, on_task_prerun, on_task_publish, registry
 
 celery_app = Celery(
     "tasks",
@@ -7,3 +16,29 @@ celery_app = Celery(
     backend="redis://localhost:6379/0",
     include=["app.tasks.tasks"],
 )
+celery_app.conf.beat_schedule = {
+    "release-expired-reservations": {
+        "task": "app.tasks.tasks.release_expired_reservations",
+        "schedule": settings.RESERVATION_SWEEP_INTERVAL,
+    },
+    "drain-order-confirmations": {
+        "task": "app.tasks.tasks.drain_order_confirmations",
+        "schedule": settings.MAIL_DRAIN_INTERVAL,
+    },
+    "relay-order-outbox": {
+        "task": "app.tasks.tasks.relay_order_outbox",
+        "schedule": settings.OUTBOX_POLL_INTERVAL,
+    },
+}
+
+before_task_publish.connect(on_task_publish, weak=False)
+task_prerun.connect(on_task_prerun, weak=False)
+task_failure.connect(on_task_failure, weak=False)
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    # Для prefork-пула метрики дочерних процессов видны только при заданном
+    # PROMETHEUS_MULTIPROC_DIR
+    if settings.CELERY_METRICS_PORT:
+        start_http_server(settings.CELERY_METRICS_PORT, registry=registry())
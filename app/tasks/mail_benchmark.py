@@ -0,0 +1,80 @@
+"""
+Замер пропускной способности отправки подтверждений заказов на локальный
+SMTP-приемник: новое соединение на каждое письмо против постоянного
+соединения SMTPMailer и пакетной отправки из очереди Redis.
+
+    python -m app.tasks.mail_benchmark --messages 500 --connect-delay 0.05
+"""
+
+import argparse
+import os
+import smtplib
+import time
+
+
+def main(messages: int, connect_delay: float) -> None:
+    from app.tasks.smtp_sink import SMTPSink
+
+    sink = SMTPSink(("127.0.0.1", 0), connect_delay).start()
+    # Настройки читаются при импорте, поэтому задаются до него
+    os.environ.update(
+        SMTP_HOST="127.0.0.1",
+        SMTP_PORT=str(sink.server_address[1]),
+        SMTP_USE_SSL="false",
+        MAIL_RATE_LIMIT_PER_MINUTE=str(messages * 10),
+    )
+
+    from app.config import settings
+    from app.tasks.mailer import (
+        ORDER_CONFIRMATION_QUEUE,
+        get_redis,
+        mailer,
+        queue_order_confirmation,
+    )
+    from app.tasks.tasks import (
+        create_order_confirmation_template,
+        drain_order_confirmations,
+    )
+
+    order = {"total_price": "42.00", "payment_method": "card", "status": "completed"}
+
+    start = time.perf_counter()
+    for number in range(messages):
+        message = create_order_confirmation_template(order, f"user{number}@example.com")
+        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
+            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+            server.send_message(message)
+    report("connection per message", messages, time.perf_counter() - start, sink)
+
+    sink.connections = 0
+    start = time.perf_counter()
+    for number in range(messages):
+        message = create_order_confirmation_template(order, f"user{number}@example.com")
+        mailer.send(message)
+    mailer.close()
+    report("pooled connection", messages, time.perf_counter() - start, sink)
+
+    sink.connections = 0
+    get_redis().delete(ORDER_CONFIRMATION_QUEUE)
+    for number in range(messages):
+        queue_order_confirmation(order, f"user{number}@example.com")
+    start = time.perf_counter()
+    sent = drain_order_confirmations()
+    mailer.close()
+    report("batched drain", sent, time.perf_counter() - start, sink)
+    sink.shutdown()
+
+
+def report(name: str, messages: int, elapsed: float, sink) -> None:
+    print(
+        f"{name:24} {messages} messages in {elapsed:.2f}s "
+        f"({messages / elapsed:.0f}/s), {sink.connections} connections"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--connect-delay", type=float, default=0.05)
+    args = parser.parse_args()
+    main(args.messages, args.connect_delay)
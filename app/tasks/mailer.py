@@ -0,0 +1,172 @@
+import json
+import logging
+import smtplib
+import time
+from email.message import EmailMessage
+from typing import Iterable, Optional
+
+from redis import Redis
+
+from app.config import settings
+from app.exception.mail_exceptions import MailServerUnavailableError
+
+logger = logging.getLogger(__name__)
+
+ORDER_CONFIRMATION_QUEUE = "mail:order-confirmations"
+DEAD_LETTER_QUEUE = "mail:order-confirmations:dead"
+RATE_LIMIT_KEY = "mail:rate:{minute}"
+
+# Ошибки соединения, после которых письмо стоит отправить позже
+TRANSIENT_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    MailServerUnavailableError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class SMTPMailer:
+    """
+    Постоянное SMTP-соединение процесса воркера: TLS-рукопожатие и вход
+    выполняются один раз на SMTP_MAX_MESSAGES_PER_CONNECTION писем.
+    """
+
+    def __init__(self):
+        self.server: Optional[smtplib.SMTP] = None
+        self.sent = 0
+        self.last_used = 0.0
+
+    def connect(self) -> smtplib.SMTP:
+        smtp_class = smtplib.SMTP_SSL if settings.SMTP_USE_SSL else smtplib.SMTP
+        server = smtp_class(
+            settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT
+        )
+        if settings.SMTP_USERNAME:
+            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        return server
+
+    def connection(self) -> smtplib.SMTP:
+        if self.server is not None:
+            expired = self.sent >= settings.SMTP_MAX_MESSAGES_PER_CONNECTION
+            idle = time.monotonic() - self.last_used > settings.SMTP_IDLE_TIMEOUT
+            # После простоя сервер мог закрыть соединение: проверяем NOOP
+            if expired or (idle and not self.alive()):
+                self.close()
+        if self.server is None:
+            try:
+                self.server = self.connect()
+            except (smtplib.SMTPException, OSError) as error:
+                # Отказ при подключении или входе (в том числе 5xx) относится
+                # к серверу или настройкам, а не к конкретному письму
+                raise MailServerUnavailableError(str(error)) from error
+            self.sent = 0
+        return self.server
+
+    def alive(self) -> bool:
+        try:
+            return self.server.noop()[0] == 250
+        except TRANSIENT_ERRORS:
+            return False
+
+    def send(self, message: EmailMessage) -> None:
+        """
+        Отправляет письмо; при разрыве соединения переподключается один раз.
+        """
+        try:
+            self.connection().send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            self.connection().send_message(message)
+        self.sent += 1
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+
+
+mailer = SMTPMailer()
+
+_redis: Optional[Redis] = None
+
+
+def get_redis() -> Redis:
+    global _redis
+    if _redis is None:
+        _redis = Redis.from_url(settings.REDIS_URL)
+    return _redis
+
+
+def queue_order_confirmation(order: dict, email_to: str) -> None:
+    """
+    Ставит подтверждение заказа в очередь пакетной отправки.
+    """
+    queue_order_confirmations([(order, email_to)])
+
+
+def queue_order_confirmations(confirmations: Iterable[tuple[dict, str]]) -> None:
+    """
+    Ставит несколько подтверждений в очередь одной командой RPUSH.
+    """
+    items = [
+        json.dumps(
+            {"order": order, "email_to": email_to, "attempts": 0, "retry_at": 0},
+            default=str,
+        )
+        for order, email_to in confirmations
+    ]
+    if items:
+        get_redis().rpush(ORDER_CONFIRMATION_QUEUE, *items)
+
+
+def take_batch(limit: int) -> list[dict]:
+    """
+    Атомарно забирает до limit писем из головы очереди.
+    """
+    pipe = get_redis().pipeline()
+    pipe.lrange(ORDER_CONFIRMATION_QUEUE, 0, limit - 1)
+    pipe.ltrim(ORDER_CONFIRMATION_QUEUE, limit, -1)
+    raw, _ = pipe.execute()
+    return [json.loads(item) for item in raw]
+
+
+def requeue(items: Iterable[dict], dead: bool = False) -> None:
+    items = [json.dumps(item, default=str) for item in items]
+    if items:
+        get_redis().rpush(
+            DEAD_LETTER_QUEUE if dead else ORDER_CONFIRMATION_QUEUE, *items
+        )
+
+
+def reserve_rate(count: int) -> int:
+    """
+    Резервирует до count писем из общего на все воркеры лимита текущей минуты
+    и возвращает, сколько можно отправить.
+    """
+    key = RATE_LIMIT_KEY.format(minute=int(time.time() // 60))
+    pipe = get_redis().pipeline()
+    pipe.incrby(key, count)
+    pipe.expire(key, 120)
+    used, _ = pipe.execute()
+    allowed = max(0, min(count, settings.MAIL_RATE_LIMIT_PER_MINUTE - (used - count)))
+    if allowed < count:
+        # Возвращаем неиспользованную часть лимита
+        get_redis().decrby(key, count - allowed)
+    return allowed
+
+
+def retry_later(item: dict) -> tuple[dict, bool]:
+    """
+    Назначает письму следующую попытку с экспоненциальной задержкой.
+    Возвращает письмо и признак того, что попытки исчерпаны.
+    """
+    item["attempts"] += 1
+    item["retry_at"] = time.time() + settings.MAIL_RETRY_BACKOFF * 2 ** (
+        item["attempts"] - 1
+    )
+    return item, item["attempts"] > settings.MAIL_MAX_RETRIES
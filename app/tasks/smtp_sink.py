@@ -0,0 +1,82 @@
+"""
+Локальный SMTP-приемник для разработки, тестов и нагрузочных замеров:
+принимает любые письма (и AUTH PLAIN) и только считает их. TLS не
+поддерживается, поэтому отправителю нужен SMTP_USE_SSL=False. Для тестов
+можно задать ответ на AUTH (auth_reply) и адреса, которые отклоняются
+(rejected_recipients).
+
+    python -m app.tasks.smtp_sink --port 1025 --connect-delay 0.05
+
+connect-delay имитирует стоимость TLS-рукопожатия и входа на реальном сервере.
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        self.server.connections += 1
+        time.sleep(self.server.connect_delay)
+        self.reply("220 smtp-sink ready")
+        while line := self.rfile.readline():
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250-smtp-sink")
+                self.reply("250-AUTH PLAIN")
+                self.reply("250 8BITMIME")
+            elif command.startswith("AUTH"):
+                self.reply(self.server.auth_reply)
+            elif command.startswith("RCPT"):
+                address = command.partition(":")[2].strip(" <>").lower()
+                if address in self.server.rejected_recipients:
+                    self.reply("550 5.1.1 No such user")
+                else:
+                    self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while (data := self.rfile.readline()) and data != b".\r\n":
+                    pass
+                with self.server.lock:
+                    self.server.messages += 1
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                # MAIL, RSET, NOOP
+                self.reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: tuple[str, int], connect_delay: float = 0.0):
+        super().__init__(address, SMTPSinkHandler)
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self.messages = 0
+        self.lock = threading.Lock()
+        self.auth_reply = "235 Authentication successful"
+        self.rejected_recipients: set[str] = set()
+
+    def start(self) -> "SMTPSink":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--connect-delay", type=float, default=0.0)
+    args = parser.parse_args()
+    with SMTPSink((args.host, args.port), args.connect_delay) as sink:
+        print(f"SMTP sink on {args.host}:{sink.server_address[1]}")
+        sink.serve_forever()
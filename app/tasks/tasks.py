@@ -1,10 +1,28 @@
+import asyncio
+import logging
 import smtplib
+import time
 from email.message import EmailMessage
 
+from celery.signals import worker_process_init, worker_process_shutdown
 from pydantic import EmailStr
 
+from app.basket.dao import ReservationDAO
 from app.config import settings
+from app.database.base_db import engine
+from app.exception.mail_exceptions import MailServerUnavailableError
+from app.order.outbox_relay import relay_pending
 from app.tasks.conf_celery import celery_app
+from app.tasks.mailer import (
+    TRANSIENT_ERRORS,
+    mailer,
+    requeue,
+    reserve_rate,
+    retry_later,
+    take_batch,
+)
+
+logger = logging.getLogger(__name__)
 
 
 def create_order_confirmation_template(
@@ -29,13 +47,154 @@ def create_order_confirmation_template(
     return email
 
 
-@celery_app.task
+@celery_app.task(
+    autoretry_for=TRANSIENT_ERRORS,
+    retry_backoff=settings.MAIL_RETRY_BACKOFF,
+    retry_jitter=True,
+    max_retries=settings.MAIL_MAX_RETRIES,
+    rate_limit=f"{settings.MAIL_RATE_LIMIT_PER_MINUTE}/m",
+)
 def send_order_confirmation_email(
     order: dict,
     email_to: EmailStr,
 ):
     msg_content = create_order_confirmation_template(order, email_to)
+    mailer.send(msg_content)
+
+
+@celery_app.task
+def drain_order_confirmations() -> int:
+    """
+    Периодически (celery beat) отправляет накопившиеся подтверждения заказов
+    пачками по MAIL_BATCH_SIZE через постоянное соединение воркера в пределах
+    общего лимита MAIL_RATE_LIMIT_PER_MINUTE. Временные ошибки откладывают
+    письмо с экспоненциальной задержкой; в очередь недоставленных уходят
+    письма с отказом 5xx по адресу или содержимому и исчерпавшие попытки.
+    Недоступность сервера (подключение, вход, отказ отправителю) прерывает
+    пачку без траты попыток. Возвращает число отправленных писем.
+    """
+    sent = 0
+    while True:
+        batch = take_batch(settings.MAIL_BATCH_SIZE)
+        now = time.time()
+        due = [item for item in batch if item["retry_at"] <= now]
+        later = [item for item in batch if item["retry_at"] > now]
+
+        # Сверх лимита минуты письма возвращаются в очередь
+        allowed = reserve_rate(len(due)) if due else 0
+        later.extend(due[allowed:])
+
+        dead, unavailable = [], False
+        for index, item in enumerate(due[:allowed]):
+            message = create_order_confirmation_template(
+                item["order"], item["email_to"]
+            )
+            try:
+                mailer.send(message)
+                sent += 1
+                continue
+            except smtplib.SMTPRecipientsRefused as error:
+                # Адрес отклонен навсегда только при ответах 5xx
+                codes = [code for code, _ in error.recipients.values()]
+                if all(code >= 500 for code in codes):
+                    dead.append(item)
+                    continue
+            except MailServerUnavailableError:
+                # Не удалось подключиться или войти: письма не виноваты,
+                # вся оставшаяся пачка возвращается без траты попыток
+                logger.warning("SMTP server is unavailable", exc_info=True)
+                later.extend(due[index:allowed])
+                unavailable = True
+                break
+            except smtplib.SMTPSenderRefused:
+                # Отправитель отклонен: ошибка настроек, а не письма
+                logger.error("SMTP server refused the sender", exc_info=True)
+                mailer.close()
+                later.extend(due[index:allowed])
+                unavailable = True
+                break
+            except smtplib.SMTPDataError as error:
+                if error.smtp_code >= 500:
+                    dead.append(item)
+                    continue
+            except TRANSIENT_ERRORS:
+                # Соединение оборвалось во время отправки: письмо тратит
+                # попытку, остальные письма пачки ждут следующего запуска
+                logger.warning("SMTP connection lost", exc_info=True)
+                mailer.close()
+                later.extend(due[index + 1 : allowed])
+                unavailable = True
+            except smtplib.SMTPResponseException:
+                logger.warning("SMTP server rejected the message", exc_info=True)
+            except Exception:
+                # Пачка уже снята с очереди: возвращаем письма и пробрасываем
+                requeue(later + due[index:allowed])
+                requeue(dead, dead=True)
+                raise
+
+            item, exhausted = retry_later(item)
+            (dead if exhausted else later).append(item)
+            if unavailable:
+                break
+
+        requeue(later)
+        if dead:
+            logger.error("%d order confirmations were not delivered", len(dead))
+            requeue(dead, dead=True)
+
+        # Очередь пуста, лимит минуты исчерпан или сервер недоступен
+        if (
+            not due
+            or unavailable
+            or allowed < len(due)
+            or len(batch) < settings.MAIL_BATCH_SIZE
+        ):
+            return sent
+
+
+@worker_process_init.connect
+def reset_mailer(**kwargs):
+    # Соединение родительского процесса не переиспользуется после fork
+    mailer.server = None
 
-    with smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-        server.send_message(msg_content)
+
+@worker_process_shutdown.connect
+def close_mailer(**kwargs):
+    mailer.close()
+
+
+async def release_expired(batch: int) -> int:
+    released = 0
+    try:
+        while True:
+            count = await ReservationDAO.release_expired(batch)
+            released += count
+            if count < batch:
+                return released
+    finally:
+        # Пул соединений привязан к циклу событий, который закрывает asyncio.run
+        await engine.dispose()
+
+
+@celery_app.task
+def release_expired_reservations() -> int:
+    """
+    Периодически (celery beat) возвращает в остатки просроченные резервы корзин.
+    """
+    return asyncio.run(release_expired(settings.RESERVATION_SWEEP_BATCH))
+
+
+async def relay_outbox(batch: int) -> int:
+    try:
+        return await relay_pending(batch)
+    finally:
+        await engine.dispose()
+
+
+@celery_app.task
+def relay_order_outbox() -> int:
+    """
+    Периодически (celery beat) публикует события заказов, которые не забрал
+    процесс app.order.outbox_relay (или если он не запущен).
+    """
+    return asyncio.run(relay_outbox(settings.OUTBOX_BATCH_SIZE))
@@ -1,10 +1,30 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Optional
+
 from jose import jwt
 from passlib.context import CryptContext
 
 from app.config import settings
+from app.exception.user_exceptions import PasswordServiceBusy
+
+# Хеши с другой стоимостью bcrypt помечаются как устаревшие и пересчитываются
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt отпускает GIL, поэтому хватает отдельного пула потоков ограниченного размера
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+password_slots = asyncio.Semaphore(
+    settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE
+)
 
 
 def get_password_hash(password: str) -> str:
@@ -21,6 +41,37 @@ def verify_password(plain_password, hashed_password) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def run_password_job(func, *args):
+    """
+    Выполняет хеширование в пуле потоков, не блокируя цикл событий.
+    Если очередь заполнена, сразу выбрасывает PasswordServiceBusy.
+    """
+    if password_slots.locked():
+        raise PasswordServiceBusy
+    async with password_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, func, *args)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Асинхронно возвращает хеш пароля с использованием bcrypt.
+    """
+    return await run_password_job(get_password_hash, password)
+
+
+async def verify_password_async(
+    plain_password, hashed_password
+) -> tuple[bool, Optional[str]]:
+    """
+    Асинхронно проверяет пароль. Вторым значением возвращает новый хеш,
+    если текущий нужно пересчитать (например, изменилась стоимость bcrypt).
+    """
+    return await run_password_job(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+
 def create_access_token(data: dict) -> str:
     """
     Создание JWT токена для авторизации пользователя.
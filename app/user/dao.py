@@ -1,7 +1,10 @@
-from sqlalchemy import insert
+from typing import Optional
+
+from sqlalchemy import insert, select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database.base_db import session_factory
+from app.database.base_db import session_scope
 from app.database.base_dao import BaseDAO
 from app.database.models import User
 from app.exception.base_exceptions import DataBaseError
@@ -11,17 +14,26 @@ class UserDAO(BaseDAO):
     model = User
 
     @classmethod
-    async def add(cls, **data):
+    async def add(cls, session: Optional[AsyncSession] = None, **data):
         try:
             query = (
                 insert(cls.model)
                 .values(**data)
                 .returning(cls.model.id, cls.model.email)
             )
-            async with session_factory() as session:
+            async with session_scope(session) as session:
                 result = await session.execute(query)
-                await session.commit()
                 return result.mappings().first()
         except SQLAlchemyError:
             DataBaseError("Database Except: Cannot insert data into table")
             return None
+
+    @classmethod
+    async def find_principal(cls, id: int, session: Optional[AsyncSession] = None):
+        """
+        Возвращает только id и email пользователя, без хеша пароля.
+        """
+        async with session_scope(session) as session:
+            query = select(cls.model.id, cls.model.email).filter_by(id=id)
+            result = await session.execute(query)
+            return result.mappings().one_or_none()
@@ -1,15 +1,31 @@
+import logging
+
 from fastapi import HTTPException, Depends, Request
+from fastapi_cache import FastAPICache
 from jose import jwt, ExpiredSignatureError, JWTError
 from pydantic import EmailStr
+from redis.exceptions import RedisError
 
+from app.cache.backend import LocalCache
 from app.config import settings
 from app.exception.user_exceptions import (
     UserNotFound,
     InvalidPasswordError,
     TokenNotFound,
 )
-from app.user.auth import verify_password
+from app.user.auth import verify_password_async
 from app.user.dao import UserDAO
+from app.user.schemas import UserRead
+
+logger = logging.getLogger(__name__)
+
+# Кэш пользователей (id, email) в памяти воркера с коротким TTL
+PRINCIPAL_CACHE = "principal"
+principal_cache = LocalCache(
+    max_entries=settings.PRINCIPAL_CACHE_SIZE,
+    max_bytes=settings.PRINCIPAL_CACHE_SIZE * 256,
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+)
 
 
 async def authenticate_user(email: EmailStr, password: str):
@@ -27,10 +43,15 @@ async def authenticate_user(email: EmailStr, password: str):
         raise UserNotFound
     else:
         # Проверяем соответствие переданного пароля хэшированному паролю пользователя
-        if not verify_password(password, user.hash_password):
+        verified, new_hash = await verify_password_async(password, user.hash_password)
+        if not verified:
             # Если пароли не совпадают, выбрасываем исключение InvalidPasswordError
             raise InvalidPasswordError
 
+        # Если изменилась стоимость bcrypt, сохраняем пересчитанный хеш
+        if new_hash:
+            await UserDAO.update(user.id, hash_password=new_hash)
+
     # Возвращаем объект пользователя, если аутентификация успешна
     return user
 
@@ -72,12 +93,53 @@ async def get_current_user(token: str = Depends(get_token)):
     except JWTError:
         raise HTTPException(status_code=401, detail="Произошла непредвиденная ошибка.")
 
-        # Извлекаем идентификатор пользователя из payload и ищем пользователя в базе данных
-    user = await UserDAO.find_one_or_none(id=int(payload.get("sub")))
+    # Извлекаем идентификатор пользователя из payload
+    user_id = int(payload.get("sub"))
 
-    # Если пользователь не найден, возвращаем ошибку 404
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден.")
+    # Сначала ищем пользователя в кэше воркера, затем в базе данных
+    cached = principal_cache.get(str(user_id))
+    if cached:
+        user = UserRead.model_validate_json(cached[1])
+    else:
+        principal = await UserDAO.find_principal(user_id)
+
+        # Если пользователь не найден, возвращаем ошибку 404
+        if not principal:
+            raise HTTPException(status_code=404, detail="Пользователь не найден.")
+
+        user = UserRead.model_validate(dict(principal))
+        principal_cache.set(str(user_id), user.model_dump_json().encode())
+
+    # Email из токена должен совпадать с актуальным email пользователя
+    email = payload.get("email")
+    if email is not None and email != user.email:
+        raise HTTPException(status_code=401, detail="Токен недействителен.")
 
     # Возвращаем объект пользователя
     return user
+
+
+async def get_current_admin(user: UserRead = Depends(get_current_user)):
+    """
+    Пропускает только администратора (email совпадает с ADMIN_EMAIL).
+    """
+    if user.email != settings.ADMIN_EMAIL:
+        raise HTTPException(status_code=403, detail="Недостаточно прав.")
+    return user
+
+
+async def invalidate_principal(user_id: int) -> None:
+    """
+    Удаляет пользователя из кэша всех воркеров (при смене пароля, email
+    или удалении). Без Redis очищается только кэш текущего воркера.
+    """
+    principal_cache.evict(key=str(user_id))
+    try:
+        backend = FastAPICache.get_backend()
+    except AssertionError:
+        # Кэш не инициализирован (например, в Celery или CLI)
+        return
+    try:
+        await backend.evict_local(PRINCIPAL_CACHE, str(user_id))
+    except RedisError:
+        logger.warning("Cannot broadcast principal eviction %s", user_id, exc_info=True)
@@ -1,13 +1,24 @@
+from functools import partial
 from typing import Optional
 
 from fastapi import APIRouter, HTTPException, Response, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.basket.dao import BasketDAO
+from app.database.base_db import after_commit, get_session
 from app.exception.base_exceptions import DataBaseError
-from app.exception.user_exceptions import UserNotFound, InvalidPasswordError
-from app.user.auth import get_password_hash, create_access_token
+from app.exception.user_exceptions import (
+    UserNotFound,
+    InvalidPasswordError,
+    PasswordServiceBusy,
+)
+from app.user.auth import get_password_hash_async, create_access_token
 from app.user.dao import UserDAO
-from app.user.dependencies import authenticate_user, get_current_user
+from app.user.dependencies import (
+    authenticate_user,
+    get_current_user,
+    invalidate_principal,
+)
 from app.database.models.user_model import User
 from app.user.schemas import UserCreate, UserBase, UserRead
 
@@ -17,7 +28,9 @@ router_user = APIRouter(prefix="/user", tags=["Пользователь"])
 
 
 @router_auth.post("/register")
-async def register_user(user_data: UserCreate):
+async def register_user(
+    user_data: UserCreate, session: AsyncSession = Depends(get_session)
+):
     """
     Эта функция обрабатывает запрос на регистрацию нового пользователя.
     Хэширует пароль и добавляет нового пользователя в базу данных.
@@ -25,7 +38,7 @@ async def register_user(user_data: UserCreate):
     """
 
     # Проверяем, существует ли пользователь с указанным email в базе данных
-    existing_user = await UserDAO.find_one_or_none(email=user_data.email)
+    existing_user = await UserDAO.find_one_or_none(session, email=user_data.email)
 
     # Если пользователь с таким email уже зарегистрирован, возвращаем ошибку 409
     if existing_user:
@@ -33,13 +46,15 @@ async def register_user(user_data: UserCreate):
 
     try:
         # Хэшируем пароль пользователя
-        hash_password = get_password_hash(user_data.password)
+        hash_password = await get_password_hash_async(user_data.password)
 
         # Добавляем нового пользователя в базу данных
-        new_user = await UserDAO.add(email=user_data.email, hash_password=hash_password)
+        new_user = await UserDAO.add(
+            session, email=user_data.email, hash_password=hash_password
+        )
 
         # При регистрации нового пользователя создаем корзину для него
-        basket_user = await BasketDAO.add(user_id=new_user["id"])
+        basket_user = await BasketDAO.add(session, user_id=new_user["id"])
 
         # Возвращаем объект нового пользователя
         return new_user
@@ -48,6 +63,10 @@ async def register_user(user_data: UserCreate):
     except DataBaseError:
         raise HTTPException(status_code=500, detail="Ошибка базы данных")
 
+    # Обрабатываем случай, когда очередь хеширования паролей переполнена
+    except PasswordServiceBusy:
+        raise HTTPException(status_code=503, detail="Сервис перегружен")
+
 
 @router_auth.post("/login")
 async def login_user(response: Response, user_data: UserCreate):
@@ -62,7 +81,7 @@ async def login_user(response: Response, user_data: UserCreate):
         user = await authenticate_user(user_data.email, user_data.password)
 
         # Создаем JWT-токен с информацией о пользователе
-        access_token = create_access_token({"sub": str(user.id)})
+        access_token = create_access_token({"sub": str(user.id), "email": user.email})
 
         # Устанавливаем токен в cookies, делая его доступным только через HTTP
         response.set_cookie("access_token", access_token, httponly=True)
@@ -78,6 +97,10 @@ async def login_user(response: Response, user_data: UserCreate):
     except InvalidPasswordError:
         raise HTTPException(status_code=401, detail="Пароль не верный")
 
+        # Обрабатываем случай, когда очередь хеширования паролей переполнена
+    except PasswordServiceBusy:
+        raise HTTPException(status_code=503, detail="Сервис перегружен")
+
 
 @router_auth.post("/logout")
 async def logout_user(response: Response) -> dict:
@@ -94,13 +117,15 @@ async def logout_user(response: Response) -> dict:
 
 
 @router_user.get("/me")
-async def read_users_me(current_user: User = Depends(get_current_user)) -> UserBase:
+async def read_users_me(current_user: User = Depends(get_current_user)) -> UserRead:
     return current_user
 
 
 @router_user.patch("/change_password")
 async def update_data_user(
-    password: str, user: UserRead = Depends(get_current_user)
+    password: str,
+    user: UserRead = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ) -> Optional[UserBase]:
     """
     Эта функция позволяет пользователю изменить свой пароль. Новый пароль
@@ -108,10 +133,14 @@ async def update_data_user(
     """
 
     # Хэшируем новый пароль
-    hash_password = get_password_hash(password)
+    try:
+        hash_password = await get_password_hash_async(password)
+    except PasswordServiceBusy:
+        raise HTTPException(status_code=503, detail="Сервис перегружен")
 
     # Обновляем данные пользователя в базе данных, сохраняя новый хэшированный пароль
-    new_data = await UserDAO.update(user.id, hash_password=hash_password)
+    new_data = await UserDAO.update(user.id, session, hash_password=hash_password)
+    after_commit(session, partial(invalidate_principal, user.id))
 
     # Возвращаем обновленный объект пользователя или None, если пользователь не найден
-    return await UserDAO.find_one_or_none(id=new_data["id"])
+    return await UserDAO.find_one_or_none(session, id=new_data["id"])
@@ -0,0 +1,95 @@
+"""
+Общие фикстуры тестов.
+
+Асинхронные тесты выполняются через плагин anyio (маркер pytest.mark.anyio).
+Тесты с фикстурами database и redis используют базу и Redis из настроек
+приложения (DB_URL, REDIS_URL) и пропускаются, если они недоступны.
+"""
+
+import uuid
+
+import pytest
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from sqlalchemy import delete, event, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config import settings
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def database():
+    from app.database.base_db import engine
+
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    except (SQLAlchemyError, OSError):
+        pytest.skip("PostgreSQL is not available")
+    yield engine
+    # Соединения пула привязаны к циклу событий теста
+    await engine.dispose()
+
+
+@pytest.fixture
+def statements(database):
+    """SQL-запросы, выполненные движком за время теста."""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, many):
+        captured.append(statement)
+
+    event.listen(database.sync_engine, "before_cursor_execute", capture)
+    yield captured
+    event.remove(database.sync_engine, "before_cursor_execute", capture)
+
+
+@pytest.fixture
+async def redis():
+    client = aioredis.from_url(settings.REDIS_URL)
+    try:
+        await client.ping()
+    except (RedisError, OSError):
+        pytest.skip("Redis is not available")
+    yield client
+    await client.close()
+
+
+@pytest.fixture
+async def basket(database):
+    """Пользователь с пустой корзиной и товар (5 шт.); удаляются после теста."""
+    from app.database.base_db import session_factory
+    from app.database.models import Basket, BasketItem, Category, Order, OrderItem
+    from app.database.models import Product, Reservation, User
+
+    async with session_factory.begin() as session:
+        category = Category(name="test")
+        user = User(email=f"{uuid.uuid4().hex}@test.local", hash_password="x")
+        session.add_all([category, user])
+        await session.flush()
+        product = Product(
+            name="p", description="d", price=10, quantity=5, category_id=category.id
+        )
+        session.add_all([product, Basket(user_id=user.id)])
+        await session.flush()
+        user_id, product_id, category_id = user.id, product.id, category.id
+    yield user_id, product_id
+
+    async with session_factory.begin() as session:
+        order_ids = select(Order.id).filter_by(user_id=user_id).scalar_subquery()
+        await session.execute(
+            delete(OrderItem).where(OrderItem.order_id.in_(order_ids))
+        )
+        await session.execute(delete(Order).filter_by(user_id=user_id))
+        basket_id = select(Basket.id).filter_by(user_id=user_id).scalar_subquery()
+        await session.execute(delete(Reservation).filter_by(basket_id=basket_id))
+        await session.execute(delete(BasketItem).filter_by(basket_id=basket_id))
+        await session.execute(delete(Basket).filter_by(user_id=user_id))
+        await session.execute(delete(User).filter_by(id=user_id))
+        await session.execute(delete(Product).filter_by(id=product_id))
+        await session.execute(delete(Category).filter_by(id=category_id))
@@ -0,0 +1,38 @@
+import httpx
+import pytest
+
+from app.main import admin, main_app
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client(database, monkeypatch):
+    async def authenticate(request):
+        return True
+
+    monkeypatch.setattr(admin.authentication_backend, "authenticate", authenticate)
+    transport = httpx.ASGITransport(app=main_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize("view", admin.views, ids=lambda view: view.identity)
+async def test_list_and_export_render(client, view):
+    response = await client.get(f"/admin/{view.identity}/list")
+    assert response.status_code == 200
+
+    # Выгрузка идет через get_model_objects со связями из sqladmin
+    response = await client.get(f"/admin/{view.identity}/export/csv")
+    assert response.status_code == 200
+    assert response.text.splitlines()[0]
+
+
+async def test_product_list_loads_category_with_join(client, statements):
+    response = await client.get("/admin/product/list")
+    assert response.status_code == 200
+
+    selects = [statement for statement in statements if "FROM products" in statement]
+    # Оценка числа строк или COUNT(*) и сама страница с JOIN категорий
+    assert len(selects) <= 2
+    assert any("JOIN categorys" in statement for statement in selects)
@@ -0,0 +1,67 @@
+import anyio
+import pytest
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.database import base_db, pool_stress
+
+
+@pytest.fixture
+def engine_kwargs(monkeypatch):
+    """
+    Подменяет create_async_engine и возвращает аргументы, с которыми его вызвал
+    make_engine.
+    """
+    calls = []
+    monkeypatch.setattr(
+        base_db,
+        "create_async_engine",
+        lambda url, **kwargs: calls.append(kwargs) or kwargs,
+    )
+    return calls
+
+
+def test_make_engine_uses_pool_settings(monkeypatch, engine_kwargs):
+    monkeypatch.setattr(settings, "DB_PGBOUNCER", False)
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT", 5000)
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 7)
+
+    kwargs = base_db.make_engine("postgresql+asyncpg://localhost/db")
+
+    assert kwargs["pool_size"] == 7
+    assert kwargs["pool_pre_ping"] == settings.DB_POOL_PRE_PING
+    connect_args = kwargs["connect_args"]
+    assert connect_args["server_settings"] == {"statement_timeout": "5000"}
+    assert (
+        connect_args["prepared_statement_cache_size"]
+        == settings.DB_STATEMENT_CACHE_SIZE
+    )
+
+
+def test_make_engine_for_pgbouncer(monkeypatch, engine_kwargs):
+    monkeypatch.setattr(settings, "DB_PGBOUNCER", True)
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT", 5000)
+
+    kwargs = base_db.make_engine("postgresql+asyncpg://localhost/db")
+
+    assert kwargs["poolclass"] is NullPool
+    assert "pool_size" not in kwargs
+    connect_args = kwargs["connect_args"]
+    # PgBouncer отклоняет параметры запуска и не сохраняет подготовленные выражения
+    assert "server_settings" not in connect_args
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_cache_size"] == 0
+    name_func = connect_args["prepared_statement_name_func"]
+    assert name_func() != name_func()
+
+
+@pytest.mark.anyio
+async def test_pool_handles_concurrency_up_to_its_size(database):
+    concurrency = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    # main сам запускает свои циклы событий: соединения этого цикла
+    # в пуле им не подходят
+    await database.dispose()
+    result = await anyio.to_thread.run_sync(
+        pool_stress.main, 1, concurrency, concurrency * 5, 0.01
+    )
+    assert result == 0
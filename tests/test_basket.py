@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import delete, func, select, update
+
+from app.basket.dao import BasketItemDAO, ReservationDAO
+from app.database.base_db import session_factory
+from app.database.models import BasketItem, Product, Reservation
+
+pytestmark = pytest.mark.anyio
+
+
+async def stock(product_id):
+    async with session_factory() as session:
+        reserved = await session.scalar(
+            select(Product.reserved).filter_by(id=product_id)
+        )
+        held = await session.scalar(
+            select(Reservation.quantity).filter_by(product_id=product_id)
+        )
+        return reserved, held
+
+
+async def test_add_after_expiry_reserves_whole_line(basket):
+    user_id, product_id = basket
+    assert (await BasketItemDAO.add_or_increase(user_id, product_id, 2))[
+        "quantity"
+    ] == 2
+    assert await stock(product_id) == (2, 2)
+
+    async with session_factory.begin() as session:
+        await session.execute(
+            update(Reservation)
+            .filter_by(product_id=product_id)
+            .values(expires_at=func.now() - timedelta(days=1))
+        )
+    assert await ReservationDAO.release_expired() >= 1
+    assert await stock(product_id) == (0, None)
+
+    # Резерв снова покрывает всю позицию, а не только добавку
+    assert (await BasketItemDAO.add_or_increase(user_id, product_id, 1))[
+        "quantity"
+    ] == 3
+    assert await stock(product_id) == (3, 3)
+
+    # Свободно 2 из 5: еще 3 не помещаются
+    assert await BasketItemDAO.add_or_increase(user_id, product_id, 3) is None
+    assert await stock(product_id) == (3, 3)
+
+
+async def test_product_delete_cascades_reservations(basket):
+    user_id, product_id = basket
+    await BasketItemDAO.add_or_increase(user_id, product_id, 1)
+
+    async with session_factory.begin() as session:
+        await session.execute(delete(BasketItem).filter_by(product_id=product_id))
+        await session.execute(delete(Product).filter_by(id=product_id))
+
+    assert await stock(product_id) == (None, None)
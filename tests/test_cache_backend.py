@@ -0,0 +1,71 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.cache.backend import TwoTierBackend, namespaces_of
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def prefix():
+    return f"test-{uuid.uuid4().hex}"
+
+
+@pytest.fixture
+async def backend(redis, prefix):
+    yield TwoTierBackend(redis, max_entries=100, max_bytes=100_000, ttl=60)
+    names = [name async for name in redis.scan_iter(match=f"*{prefix}*")]
+    if names:
+        await redis.unlink(*names)
+
+
+def test_namespaces_of_skips_root_and_partial_scopes():
+    assert namespaces_of("cache:product-list:category:5:abc") == [
+        "cache:product-list",
+        "cache:product-list:category:5",
+    ]
+    assert namespaces_of("cache:product:abc") == ["cache:product"]
+    assert namespaces_of("cache:abc") == []
+
+
+async def test_clear_removes_only_namespace_keys(backend, redis, prefix):
+    await backend.set(f"{prefix}:product-list:category:5:a", b"1", 60)
+    await backend.set(f"{prefix}:product-list:category:6:b", b"2", 60)
+    await backend.set(f"{prefix}:product-list:all:c", b"3", 60)
+
+    assert await backend.clear(namespace=f"{prefix}:product-list:category:5") == 1
+    assert not await redis.exists(f"{prefix}:product-list:category:5:a")
+    # Удаленный ключ убран и из индекса namespace
+    members = await redis.smembers(backend.index_key(f"{prefix}:product-list"))
+    assert {member.decode() for member in members} == {
+        f"{prefix}:product-list:category:6:b",
+        f"{prefix}:product-list:all:c",
+    }
+
+    assert await backend.clear(namespace=f"{prefix}:product-list") == 2
+    assert not [name async for name in redis.scan_iter(match=f"{prefix}:*")]
+    assert not [
+        name
+        async for name in redis.scan_iter(match=f"{backend.index_prefix}:{prefix}*")
+    ]
+
+
+async def test_set_does_not_index_root_prefix(backend, redis, prefix):
+    await backend.set(f"{prefix}:product:1:a", b"1", 60)
+
+    assert not await redis.exists(backend.index_key(prefix))
+
+
+async def test_set_prunes_expired_members(backend, redis, prefix):
+    index = backend.index_key(f"{prefix}:product-list")
+    await backend.set(f"{prefix}:product-list:search:old", b"1", 1)
+    await asyncio.sleep(1.1)
+
+    await backend.set(f"{prefix}:product-list:search:new", b"2", 60)
+
+    members = await redis.smembers(index)
+    assert {member.decode() for member in members} == {
+        f"{prefix}:product-list:search:new"
+    }
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi_cache import FastAPICache
+from redis.exceptions import RedisError
+
+from app.cache.decorator import cached
+from app.cache.invalidation import scoped_key_builder
+from app.config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+class LockedRedis:
+    """
+    Redis, в котором блокировку загрузки держит другой воркер.
+    """
+
+    async def set(self, *args, **kwargs):
+        return False
+
+    async def eval(self, *args):
+        return 0
+
+
+class ScriptedBackend:
+    """
+    Бэкенд, который отдает заранее заданные значения по очереди.
+    """
+
+    redis = LockedRedis()
+
+    def __init__(self, *values):
+        self.values = list(values)
+        self.stored = []
+
+    async def get(self, key):
+        return self.values.pop(0) if self.values else None
+
+    async def set(self, key, value, expire=None):
+        self.stored.append(json.loads(value)["value"])
+
+
+@pytest.fixture
+def cache_backend(monkeypatch):
+    def install(backend):
+        FastAPICache.reset()
+        FastAPICache.init(backend, prefix="test")
+        return backend
+
+    monkeypatch.setattr(settings, "CACHE_DISTRIBUTED_LOCK", True)
+    monkeypatch.setattr(settings, "CACHE_LOCK_WAIT", 0.1)
+    yield install
+    FastAPICache.reset()
+
+
+def envelope(value, fresh_until: float) -> bytes:
+    return json.dumps({"fresh_until": fresh_until, "value": value}).encode()
+
+
+async def test_miss_does_not_reuse_background_refresh(cache_backend):
+    # Первый запрос видит устаревшее значение и запускает фоновое обновление,
+    # которое не получит блокировку. Второй запрос приходит после очистки
+    # ключа (промах) и должен загрузить значение сам, а не получить None
+    backend = cache_backend(ScriptedBackend(envelope({"value": "stale"}, 0)))
+    loads = []
+
+    @cached("race", scoped_key_builder("all"), expire=60, stale_ttl=60)
+    async def endpoint():
+        loads.append(1)
+        return {"value": "fresh"}
+
+    stale = await endpoint()
+    # Даем фоновому обновлению начаться, но не завершиться
+    await asyncio.sleep(0)
+    missed = await endpoint()
+
+    assert stale == {"value": "stale"}
+    assert missed == {"value": "fresh"}
+    assert backend.stored == [{"value": "fresh"}]
+    assert len(loads) == 1
+
+
+async def test_miss_waits_for_value_loaded_by_lock_owner(cache_backend):
+    fresh = envelope({"value": "cached"}, time.time() + 60)
+    cache_backend(ScriptedBackend(None, None, fresh))
+
+    @cached("wait", scoped_key_builder("all"), expire=60)
+    async def endpoint():
+        raise AssertionError("value must come from the lock owner")
+
+    assert await endpoint() == {"value": "cached"}
+
+
+async def test_miss_loads_when_redis_fails_during_lock_wait(cache_backend):
+    class FailingBackend(ScriptedBackend):
+        async def get(self, key):
+            if self.values:
+                return self.values.pop(0)
+            raise RedisError("connection lost")
+
+    cache_backend(FailingBackend(None))
+
+    @cached("failing", scoped_key_builder("all"), expire=60)
+    async def endpoint():
+        return {"value": "loaded"}
+
+    assert await endpoint() == {"value": "loaded"}
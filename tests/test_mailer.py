@@ -0,0 +1,124 @@
+import json
+import smtplib
+
+import pytest
+
+from app.config import settings
+from app.exception.mail_exceptions import MailServerUnavailableError
+from app.tasks import mailer as mail
+from app.tasks.mailer import SMTPMailer
+from app.tasks.smtp_sink import SMTPSink
+from app.tasks.tasks import create_order_confirmation_template
+
+ORDER = {"total_price": "42.00", "payment_method": "card", "status": "completed"}
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    server = SMTPSink(("127.0.0.1", 0)).start()
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", server.server_address[1])
+    monkeypatch.setattr(settings, "SMTP_USE_SSL", False)
+    monkeypatch.setattr(settings, "SMTP_USERNAME", "shop@example.com")
+    monkeypatch.setattr(settings, "SMTP_PASSWORD", "secret")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def mail_queue(redis, monkeypatch):
+    """
+    Пустые очереди писем и лимит, который не мешает тестам.
+    """
+    monkeypatch.setattr(settings, "MAIL_RATE_LIMIT_PER_MINUTE", 10_000)
+    keys = [mail.ORDER_CONFIRMATION_QUEUE, mail.DEAD_LETTER_QUEUE]
+    client = mail.get_redis()
+    client.delete(*keys)
+    yield client
+    client.delete(*keys)
+    mail.mailer.close()
+
+
+def message(email_to: str = "user@example.com"):
+    return create_order_confirmation_template(ORDER, email_to)
+
+
+def queued(client, key: str) -> list[dict]:
+    return [json.loads(item) for item in client.lrange(key, 0, -1)]
+
+
+def test_mailer_reuses_one_connection(sink):
+    mailer = SMTPMailer()
+    for _ in range(3):
+        mailer.send(message())
+    mailer.close()
+
+    assert sink.messages == 3
+    assert sink.connections == 1
+
+
+def test_mailer_reconnects_after_disconnect(sink):
+    mailer = SMTPMailer()
+    mailer.send(message())
+    # Сервер закрыл соединение (например, по таймауту простоя)
+    mailer.server.close()
+    mailer.send(message())
+    mailer.close()
+
+    assert sink.messages == 2
+    assert sink.connections == 2
+
+
+def test_mailer_reports_failed_login_as_unavailable(sink):
+    sink.auth_reply = "535 5.7.8 Authentication failed"
+    mailer = SMTPMailer()
+
+    with pytest.raises(MailServerUnavailableError) as error:
+        mailer.send(message())
+    assert isinstance(error.value.__cause__, smtplib.SMTPAuthenticationError)
+    assert sink.messages == 0
+
+
+@pytest.mark.anyio
+async def test_drain_sends_queued_confirmations(sink, mail_queue):
+    from app.tasks.tasks import drain_order_confirmations
+
+    mail.queue_order_confirmations(
+        [(ORDER, f"user{number}@example.com") for number in range(5)]
+    )
+
+    assert drain_order_confirmations() == 5
+    assert sink.messages == 5
+    assert sink.connections == 1
+    assert mail_queue.llen(mail.ORDER_CONFIRMATION_QUEUE) == 0
+
+
+@pytest.mark.anyio
+async def test_drain_dead_letters_only_refused_recipients(sink, mail_queue):
+    from app.tasks.tasks import drain_order_confirmations
+
+    sink.rejected_recipients.add("missing@example.com")
+    mail.queue_order_confirmations(
+        [(ORDER, "user@example.com"), (ORDER, "missing@example.com")]
+    )
+
+    assert drain_order_confirmations() == 1
+    dead = queued(mail_queue, mail.DEAD_LETTER_QUEUE)
+    assert [item["email_to"] for item in dead] == ["missing@example.com"]
+
+
+@pytest.mark.anyio
+async def test_drain_keeps_batch_when_login_fails(sink, mail_queue):
+    from app.tasks.tasks import drain_order_confirmations
+
+    sink.auth_reply = "535 5.7.8 Authentication failed"
+    mail.queue_order_confirmations(
+        [(ORDER, f"user{number}@example.com") for number in range(3)]
+    )
+
+    assert drain_order_confirmations() == 0
+    # Письма вернулись в очередь без траты попыток, в недоставленные не попали
+    pending = queued(mail_queue, mail.ORDER_CONFIRMATION_QUEUE)
+    assert [item["attempts"] for item in pending] == [0, 0, 0]
+    assert mail_queue.llen(mail.DEAD_LETTER_QUEUE) == 0
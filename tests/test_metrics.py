@@ -0,0 +1,27 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+
+pytestmark = pytest.mark.anyio
+
+
+def pool_gauge(state):
+    return REGISTRY.get_sample_value("db_pool_connections", {"state": state}) or 0
+
+
+async def test_pool_gauges_survive_invalidate_and_detach(database):
+    await database.dispose()
+    before = pool_gauge("checked_out"), pool_gauge("open")
+
+    async with database.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+        await connection.invalidate()
+    async with database.connect() as connection:
+        raw = await connection.get_raw_connection()
+        raw.detach()
+    async with database.connect() as connection:
+        assert pool_gauge("checked_out") == before[0] + 1
+        await connection.execute(text("SELECT 1"))
+
+    assert pool_gauge("checked_out") == before[0]
+    assert pool_gauge("open") == before[1] + database.pool.checkedin()
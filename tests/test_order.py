@@ -0,0 +1,27 @@
+import pytest
+
+from app.basket.dao import BasketItemDAO
+from app.database.base_db import session_factory
+from app.database.models.order_model import PaymentType
+from app.order.dao import OrderDAO
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_checkout_returns_inserted_items(basket, statements):
+    user_id, product_id = basket
+    await BasketItemDAO.add_or_increase(user_id, product_id, 2)
+
+    statements.clear()
+    async with session_factory.begin() as session:
+        order = await OrderDAO.checkout(user_id, PaymentType.Card, session)
+
+    [item] = order["items"]
+    assert item["order_id"] == order["id"]
+    assert (item["product_id"], item["quantity"]) == (product_id, 2)
+
+    # Позиции приходят из RETURNING, без отдельного SELECT по orderitems
+    touching = [statement for statement in statements if "orderitems" in statement]
+    assert len(touching) == 1
+    assert touching[0].startswith("INSERT INTO orderitems")
+    assert "RETURNING" in touching[0]
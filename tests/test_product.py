@@ -0,0 +1,35 @@
+import httpx
+import pytest
+
+from app.exception.base_exceptions import InvalidFilterError
+from app.main import main_app
+from app.product.dao import ProductDAO
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client():
+    transport = httpx.ASGITransport(app=main_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize("path", ["/product/search", "/product/search/facets"])
+async def test_search_rejects_unknown_filter(client, path):
+    response = await client.get(path, params={"q": "phone", "colour": "red"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["query", "colour"]
+
+
+async def test_search_accepts_declared_filters(client, database):
+    response = await client.get(
+        "/product/search",
+        params={"q": "phone", "min_price": 1, "in_stock": "true", "limit": 5},
+    )
+    assert response.status_code == 200
+
+
+def test_select_by_rejects_unknown_column():
+    with pytest.raises(InvalidFilterError):
+        ProductDAO.select_by({"colour": "red"})
@@ -0,0 +1,10 @@
+import pytest
+
+from app.database import query_plans
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_dao_queries_do_not_scan_large_tables(database):
+    # Засев выполняется в транзакции, которая откатывается
+    assert await query_plans.main(rows=100_000, categories=100, threshold=1_000) == 0